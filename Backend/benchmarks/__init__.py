@@ -0,0 +1 @@
+# Benchmarks package for lead scoring performance
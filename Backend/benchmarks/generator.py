@@ -0,0 +1,132 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+
+BROWSERS = ["Chrome", "Firefox", "Safari", "Edge"]
+OPERATING_SYSTEMS = ["Windows", "macOS", "Linux", "Android", "iOS"]
+PAGE_PATHS = ["/", "/pricing", "/features", "/blog", "/about", "/contact", "/docs", "/careers"]
+CLICK_TARGETS = [
+    ("nav a.pricing", "Pricing"),
+    ("nav a.features", "Features"),
+    ("button.signup", "Sign up"),
+    ("a.read-more", "Read more"),
+    ("button.cta", "Get a demo"),
+    ("button.waitlist", "Be an early bird"),
+]
+# Share of clicks that hit one of the high-value targets above
+IMPORTANT_CLICK_SHARE = 0.1
+
+
+class SyntheticSite:
+    """
+    Generates one synthetic site with users, sessions, page views and clicks.
+
+    Distributions are skewed like real traffic: most sessions are short with
+    a few page views, while a long tail of engaged sessions views many pages
+    and clicks high-value buttons. All rows are written with COPY, so the
+    session counter triggers run exactly as they do for batched ingestion.
+    """
+
+    def __init__(self, users: int, sessions_per_user: float, seed: int = 42):
+        self.users = users
+        self.sessions_per_user = sessions_per_user
+        self.random = random.Random(seed)
+        self.site_id = f"bench-{uuid.uuid4().hex[:8]}"
+        self.website_id = None
+        self.session_ids: List[uuid.UUID] = []
+        self.counts: Dict[str, int] = {}
+
+    async def create(self, connection) -> Dict[str, int]:
+        """Write the whole site in one transaction and return row counts"""
+        rnd = self.random
+        now = datetime.now()
+
+        async with connection.transaction():
+            self.website_id = await connection.fetchval(
+                """
+                INSERT INTO websites (site_id, name, url)
+                VALUES ($1, $2, $3)
+                RETURNING website_id
+                """,
+                self.site_id, f"Benchmark {self.site_id}", f"https://{self.site_id}.example.com"
+            )
+
+            page_ids = []
+            for path in PAGE_PATHS:
+                page_ids.append(await connection.fetchval(
+                    "INSERT INTO pages (website_id, url, title) VALUES ($1, $2, $3) RETURNING page_id",
+                    self.website_id, f"https://{self.site_id}.example.com{path}", path.strip("/") or "Home"
+                ))
+
+            users, sessions, page_views, clicks = [], [], [], []
+            for _ in range(self.users):
+                user_id = uuid.uuid4()
+                first_seen = now - timedelta(days=rnd.uniform(0, 30))
+                users.append((user_id, self.website_id, str(uuid.uuid4()), first_seen, first_seen))
+
+                for _ in range(max(1, int(rnd.expovariate(1 / self.sessions_per_user)))):
+                    session_id = uuid.uuid4()
+                    start = first_seen + timedelta(hours=rnd.uniform(0, 24 * 7))
+                    duration = timedelta(seconds=int(rnd.lognormvariate(4.5, 1.2)))
+                    sessions.append((
+                        session_id, self.website_id, user_id, rnd.choice(BROWSERS),
+                        rnd.choice(OPERATING_SYSTEMS), start, start + duration, duration
+                    ))
+                    self.session_ids.append(session_id)
+
+                    views = max(1, int(rnd.expovariate(1 / 3)))
+                    for view in range(views):
+                        view_start = start + duration * view / views
+                        page_views.append((
+                            session_id, user_id, rnd.choice(page_ids), view_start, view_start + duration / views
+                        ))
+
+                    for _ in range(int(rnd.expovariate(1 / 2))):
+                        if rnd.random() < IMPORTANT_CLICK_SHARE:
+                            selector, text = rnd.choice(CLICK_TARGETS[4:])
+                        else:
+                            selector, text = rnd.choice(CLICK_TARGETS[:4])
+                        clicks.append((
+                            session_id, user_id, rnd.choice(page_ids), selector, text,
+                            start + duration * rnd.random(), rnd.randint(0, 1920), rnd.randint(0, 1080)
+                        ))
+
+            await connection.copy_records_to_table(
+                "users", records=users,
+                columns=["user_id", "website_id", "visitor_uuid", "first_seen", "last_seen"]
+            )
+            await connection.copy_records_to_table(
+                "sessions", records=sessions,
+                columns=["session_id", "website_id", "user_id", "browser", "os",
+                         "start_time", "end_time", "session_duration"]
+            )
+            await connection.copy_records_to_table(
+                "page_views", records=page_views,
+                columns=["session_id", "user_id", "page_id", "view_start", "view_end"]
+            )
+            await connection.copy_records_to_table(
+                "click_events", records=clicks,
+                columns=["session_id", "user_id", "page_id", "element_selector", "element_text",
+                         "click_time", "x_coord", "y_coord"]
+            )
+
+        self.counts = {
+            "users": len(users),
+            "sessions": len(sessions),
+            "page_views": len(page_views),
+            "click_events": len(clicks)
+        }
+        return self.counts
+
+    def sample_sessions(self, count: int) -> List[uuid.UUID]:
+        """A reproducible random sample of the generated session ids"""
+        return self.random.sample(self.session_ids, min(count, len(self.session_ids)))
+
+    async def drop(self, connection):
+        """Remove the site and, through ON DELETE CASCADE, everything generated for it"""
+        if self.website_id is not None:
+            await connection.execute("DELETE FROM websites WHERE website_id = $1", self.website_id)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"site_id": self.site_id, "website_id": self.website_id, **self.counts}
@@ -0,0 +1,184 @@
+"""
+Lead scoring benchmarks against the database in DATABASE_URL.
+
+Generates a synthetic site, measures LeadScoringService and writes the
+results as JSON, then removes the site again.
+
+Usage (from the Backend directory):
+    python -m benchmarks.lead_scoring_bench [--users 2000] [--sessions-per-user 3]
+        [--samples 200] [--output benchmarks/results/latest.json] [--baseline previous.json] [--keep]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+from config.database import db_manager
+from services.lead_scoring_service import LeadScoringService
+from benchmarks.generator import SyntheticSite
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds (all zero for a scenario without samples)"""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(percentile(0.50), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+async def time_each(func, items) -> List[float]:
+    latencies = []
+    for item in items:
+        started = time.perf_counter()
+        await func(item)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def bench_single_session(site: SyntheticSite, samples: int) -> Dict[str, Any]:
+    """Latency of scoring one session (read features, compute score)"""
+    return summarize(await time_each(LeadScoringService.calculate_session_lead_score, site.sample_sessions(samples)))
+
+
+async def bench_session_end(site: SyntheticSite, samples: int) -> Dict[str, Any]:
+    """Latency of the end-of-session scoring path (score, write, user average by trigger)"""
+    return summarize(await time_each(LeadScoringService.process_session_end_scoring, site.sample_sessions(samples)))
+
+
+async def bench_batch(site: SyntheticSite, batch_size: int) -> Dict[str, Any]:
+    """Throughput of the batch scoring API over all sessions of the site"""
+    session_ids = site.session_ids
+    started = time.perf_counter()
+    for start in range(0, len(session_ids), batch_size):
+        await LeadScoringService.calculate_session_lead_scores(session_ids[start:start + batch_size])
+    elapsed = time.perf_counter() - started
+    return {
+        "batch_size": batch_size,
+        "sessions": len(session_ids),
+        "elapsed_seconds": round(elapsed, 3),
+        "sessions_per_second": round(len(session_ids) / elapsed, 1) if elapsed else None
+    }
+
+
+async def bench_rescore(site: SyntheticSite, recount: bool) -> Dict[str, Any]:
+    """Throughput of bulk rescoring the whole site"""
+    started = time.perf_counter()
+    summary = await LeadScoringService.rescore_site(site.website_id, recount=recount)
+    elapsed = time.perf_counter() - started
+    if summary is None:
+        raise RuntimeError("rescore_site failed")
+    return {
+        "recount": recount,
+        "sessions": summary["sessions_scored"],
+        "sessions_changed": summary["sessions_changed"],
+        "elapsed_seconds": round(elapsed, 3),
+        "sessions_per_second": round(summary["sessions_scored"] / elapsed, 1) if elapsed else None
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print the relative change of every headline number against a previous run"""
+    headline = [
+        ("single_session", "p50_ms"), ("single_session", "p95_ms"),
+        ("session_end", "p50_ms"), ("session_end", "p95_ms"),
+        ("batch_scoring", "sessions_per_second"),
+        ("rescore", "sessions_per_second"), ("rescore_recount", "sessions_per_second"),
+    ]
+    print(f"\n📊 Compared with {baseline.get('revision') or 'baseline'} ({baseline.get('timestamp')}):")
+    for section, key in headline:
+        old = baseline.get("benchmarks", {}).get(section, {}).get(key)
+        new = results["benchmarks"].get(section, {}).get(key)
+        if old and new is not None:
+            print(f"   {section}.{key}: {old} -> {new} ({(new - old) / old * 100:+.1f}%)")
+
+
+async def main(args) -> int:
+    if not await db_manager.connect():
+        return 1
+
+    site = SyntheticSite(args.users, args.sessions_per_user, seed=args.seed)
+    try:
+        pool = await db_manager.get_connection("adhoc")
+        async with pool.acquire() as connection:
+            started = time.perf_counter()
+            counts = await site.create(connection)
+            generation = round(time.perf_counter() - started, 3)
+        print(f"✅ Generated {counts} in {generation}s")
+
+        benchmarks = {
+            "single_session": await bench_single_session(site, args.samples),
+            "session_end": await bench_session_end(site, args.samples),
+            "batch_scoring": await bench_batch(site, args.batch_size),
+            "rescore": await bench_rescore(site, recount=False),
+            "rescore_recount": await bench_rescore(site, recount=True),
+        }
+        for name, result in benchmarks.items():
+            print(f"⏱️ {name}: {result}")
+
+        results = {
+            "suite": "lead_scoring",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "parameters": {
+                "users": args.users,
+                "sessions_per_user": args.sessions_per_user,
+                "samples": args.samples,
+                "batch_size": args.batch_size,
+                "seed": args.seed
+            },
+            "dataset": {**site.describe(), "generation_seconds": generation},
+            "benchmarks": benchmarks
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+        if args.baseline:
+            with open(args.baseline) as f:
+                compare(results, json.load(f))
+        return 0
+    finally:
+        if not args.keep:
+            async with (await db_manager.get_connection("adhoc")).acquire() as connection:
+                await site.drop(connection)
+        await db_manager.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark lead scoring on a synthetic site")
+    parser.add_argument("--users", type=int, default=2000, help="synthetic users to generate")
+    parser.add_argument("--sessions-per-user", type=float, default=3.0, help="mean sessions per user")
+    parser.add_argument("--samples", type=int, default=200, help="sessions timed for the latency benchmarks")
+    parser.add_argument("--batch-size", type=int, default=500, help="session ids per batch scoring call")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the generator")
+    parser.add_argument("--output", default="benchmarks/results/latest.json", help="JSON results file")
+    parser.add_argument("--baseline", help="results file of a previous run to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic site in the database")
+    sys.exit(asyncio.run(main(parser.parse_args())))
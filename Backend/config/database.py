@@ -1,57 +1,161 @@
 import os
+import time
 import asyncpg
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Dict, Any
+from config.statements import statements
 
 # Load environment variables
 load_dotenv()
 
+# Workloads with their own pool, so slow dashboard or ad-hoc queries cannot starve ingestion.
+# Defaults can be overridden per workload with DB_POOL_<NAME>_MIN / _MAX / _COMMAND_TIMEOUT / _ACQUIRE_TIMEOUT.
+POOL_DEFAULTS = {
+    "ingest": {"min": 1, "max": 8, "command_timeout": 10, "acquire_timeout": 5},
+    "dashboard": {"min": 1, "max": 4, "command_timeout": 30, "acquire_timeout": 10},
+    "adhoc": {"min": 1, "max": 2, "command_timeout": 60, "acquire_timeout": 15},
+}
+
+
+class WorkloadPool:
+    """asyncpg pool for one workload that records how long callers wait to acquire a connection"""
+
+    def __init__(self, name: str, pool: asyncpg.Pool, acquire_timeout: float):
+        self.name = name
+        self.pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.acquires = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Acquire a connection, recording the wait time"""
+        started = time.perf_counter()
+        try:
+            connection = await self.pool.acquire(timeout=self.acquire_timeout)
+        except Exception:
+            self.timeouts += 1
+            raise
+
+        wait = time.perf_counter() - started
+        self.acquires += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.in_use += 1
+        try:
+            yield connection
+        finally:
+            self.in_use -= 1
+            await self.pool.release(connection)
+
+    async def close(self):
+        await self.pool.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "size": self.pool.get_size(),
+            "max_size": self.pool.get_max_size(),
+            "idle": self.pool.get_idle_size(),
+            "in_use": self.in_use,
+            "acquires": self.acquires,
+            "acquire_timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait / self.acquires * 1000, 2) if self.acquires else 0,
+            "max_wait_ms": round(self.max_wait * 1000, 2)
+        }
+
+
 class DatabaseManager:
     def __init__(self):
-        self.connection_pool: Optional[asyncpg.Pool] = None
+        self.pools: Dict[str, WorkloadPool] = {}
         self.database_url = os.getenv("DATABASE_URL")
-        
+
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable is not set")
-    
+
+        # "transaction" for pgbouncer-style transaction pooling, "session" for a
+        # direct or session-pooled connection, "auto" to guess from the URL
+        self.pool_mode = os.getenv("DB_POOL_MODE", "auto").lower()
+
+    def uses_transaction_pooler(self) -> bool:
+        """Whether prepared statements must be avoided because of a transaction-pooling proxy"""
+        if self.pool_mode in ("transaction", "pgbouncer"):
+            return True
+        if self.pool_mode == "session":
+            return False
+
+        # Auto-detect: default pgbouncer / Supabase pooler ports or a pooler host name
+        parsed = urlparse(self.database_url)
+        return parsed.port in (6432, 6543) or "pooler" in (parsed.hostname or "") or "pgbouncer" in (parsed.hostname or "")
+
+    @staticmethod
+    def pool_settings(name: str) -> Dict[str, float]:
+        """Pool settings for a workload, read from the environment with built-in defaults"""
+        settings = {}
+        for key, default in POOL_DEFAULTS[name].items():
+            value = os.getenv(f"DB_POOL_{name.upper()}_{key.upper()}")
+            settings[key] = type(default)(value) if value else default
+        return settings
+
     async def connect(self):
-        """Create database connection pool"""
+        """Create one database connection pool per workload"""
         try:
-            self.connection_pool = await asyncpg.create_pool(
-                self.database_url,
-                min_size=1,
-                max_size=10,
-                command_timeout=60,
-                statement_cache_size=0  # Disable prepared statement cache to avoid conflicts
-            )
-            print("✅ Database connection pool created successfully")
+            # Prepared statements conflict with transaction pooling, so only use them on direct connections
+            statements.enabled = not self.uses_transaction_pooler()
+
+            for name in POOL_DEFAULTS:
+                settings = self.pool_settings(name)
+                pool = await asyncpg.create_pool(
+                    self.database_url,
+                    min_size=settings["min"],
+                    max_size=settings["max"],
+                    command_timeout=settings["command_timeout"],
+                    statement_cache_size=100 if statements.enabled else 0,
+                    init=statements.prepare_connection
+                )
+                self.pools[name] = WorkloadPool(name, pool, settings["acquire_timeout"])
+                print(f"✅ Database connection pool '{name}' created (max_size={settings['max']})")
+
+            mode = f"{len(statements.queries)} prepared statements" if statements.enabled else "transaction pooler, prepared statements disabled"
+            print(f"✅ Database connection pools created successfully ({mode})")
             return True
         except Exception as e:
             print(f"❌ Failed to create database connection pool: {e}")
+            await self.disconnect()
             return False
-    
+
     async def disconnect(self):
-        """Close database connection pool"""
-        if self.connection_pool:
-            await self.connection_pool.close()
-            print("🔌 Database connection pool closed")
-    
-    async def get_connection(self):
-        """Get a connection from the pool"""
-        if not self.connection_pool:
+        """Close all database connection pools"""
+        for name, pool in self.pools.items():
+            await pool.close()
+            print(f"🔌 Database connection pool '{name}' closed")
+        self.pools = {}
+
+    async def get_connection(self, workload: str = "ingest") -> WorkloadPool:
+        """Get the connection pool for a workload ("ingest", "dashboard" or "adhoc")"""
+        if not self.pools:
             raise RuntimeError("Database not connected. Call connect() first.")
-        return self.connection_pool
-    
+        return self.pools[workload]
+
+    def pool_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Acquire-wait and usage metrics for every pool"""
+        return {name: pool.metrics() for name, pool in self.pools.items()}
+
     async def test_connection(self):
         """Test database connection"""
         try:
-            async with self.connection_pool.acquire() as connection:
-                await connection.execute("SELECT 1")
-                print("✅ Database connection test successful")
-                return True
+            for pool in self.pools.values():
+                async with pool.acquire() as connection:
+                    await connection.execute("SELECT 1")
+            print("✅ Database connection test successful")
+            return True
         except Exception as e:
             print(f"❌ Database connection test failed: {e}")
             return False
 
 # Global database manager instance
-db_manager = DatabaseManager()
\ No newline at end of file
+db_manager = DatabaseManager()
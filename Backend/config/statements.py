@@ -0,0 +1,82 @@
+import logging
+from typing import Dict, List, Any
+
+logger = logging.getLogger(__name__)
+
+
+class StatementRegistry:
+    """
+    Registry of fixed hot queries that are prepared once per pooled connection.
+
+    Services register their hot SQL at import time and run it through the
+    registry. When the pool talks to Postgres directly (or through a
+    session-pooling proxy), the pool's init hook prepares every registered
+    statement on each new connection, so Postgres parses and plans them once
+    per connection instead of on every call. Behind a transaction-pooling
+    proxy such as pgbouncer, prepared statements cannot be used safely: the
+    registry then stays disabled and every query runs unprepared, exactly as
+    before.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.queries: List[str] = []
+        self.prepared: Dict[int, Dict[str, Any]] = {}
+
+    def register(self, sql: str) -> str:
+        """Register a hot query to prepare on every connection. Returns the SQL unchanged."""
+        if sql not in self.queries:
+            self.queries.append(sql)
+        return sql
+
+    async def prepare_connection(self, connection):
+        """Pool init hook: prepare every registered statement on a new connection"""
+        if not self.enabled:
+            return
+
+        pid = connection.get_server_pid()
+        statements = {}
+        for sql in self.queries:
+            try:
+                statements[sql] = await connection.prepare(sql)
+            except Exception as e:
+                # Fall back to unprepared execution for this query only
+                logger.error(f"Error preparing statement: {e}")
+
+        self.prepared[pid] = statements
+        connection.add_termination_listener(lambda _: self.prepared.pop(pid, None))
+
+    def _statement(self, connection, sql: str):
+        if not self.enabled:
+            return None
+        return self.prepared.get(connection.get_server_pid(), {}).get(sql)
+
+    async def fetch(self, connection, sql: str, *args):
+        statement = self._statement(connection, sql)
+        if statement is None:
+            return await connection.fetch(sql, *args)
+        return await statement.fetch(*args)
+
+    async def fetchrow(self, connection, sql: str, *args):
+        statement = self._statement(connection, sql)
+        if statement is None:
+            return await connection.fetchrow(sql, *args)
+        return await statement.fetchrow(*args)
+
+    async def fetchval(self, connection, sql: str, *args):
+        statement = self._statement(connection, sql)
+        if statement is None:
+            return await connection.fetchval(sql, *args)
+        return await statement.fetchval(*args)
+
+    async def execute(self, connection, sql: str, *args) -> str:
+        """Run a statement that returns no rows and return its status (e.g. "UPDATE 1")"""
+        statement = self._statement(connection, sql)
+        if statement is None:
+            return await connection.execute(sql, *args)
+        await statement.fetch(*args)
+        return statement.get_statusmsg()
+
+
+# Global statement registry instance
+statements = StatementRegistry()
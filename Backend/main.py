@@ -2,11 +2,18 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from config.database import db_manager
+from services.click_buffer import click_buffer
+from services.site_registry import site_registry
+from services.scoring_worker import scoring_worker
+from services.live_scores import live_scores
+from services.session_sweeper import session_sweeper
+from services.analytics_rollups import analytics_rollups
 from routers.websites import router as websites_router
 from routers.sessions import router as sessions_router
 from routers.users import router as users_router
 from routers.page_views import router as page_views_router
 from routers.click_events import router as click_events_router
+from routers.events import router as events_router
 from routers.lead_scoring import router as lead_scoring_router
 from routers.analytics import router as analytics_router
 from routers.query import router as query_router
@@ -29,12 +36,35 @@ async def lifespan(app: FastAPI):
         print("❌ Database connection test failed. Shutting down...")
         raise RuntimeError("Database connection test failed")
     
+    # Warm the site_id -> website_id registry
+    await site_registry.warm()
+    
+    # Start write-behind buffering of click events (if enabled)
+    await click_buffer.start()
+    
+    # Start background lead scoring
+    await scoring_worker.start()
+    
+    # Start live lead scores for in-progress sessions
+    await live_scores.start()
+    
+    # Start closing and scoring sessions whose end beacon never arrived
+    await session_sweeper.start()
+    
+    # Start folding new events into the hourly dashboard rollups
+    await analytics_rollups.start()
+    
     print("✅ Web Analytics API started successfully!")
     
     yield  # This is where the application runs
     
     # Shutdown
     print("🛑 Shutting down Web Analytics API...")
+    await click_buffer.stop()
+    await session_sweeper.stop()
+    await analytics_rollups.stop()
+    await scoring_worker.stop()
+    await live_scores.stop()
     await db_manager.disconnect()
     print("✅ Web Analytics API shutdown complete!")
 
@@ -58,6 +88,7 @@ app.include_router(sessions_router)
 app.include_router(users_router)
 app.include_router(page_views_router)
 app.include_router(click_events_router)
+app.include_router(events_router)
 app.include_router(lead_scoring_router)
 app.include_router(analytics_router)
 app.include_router(query_router)
@@ -82,8 +113,16 @@ async def health_check():
             "error": str(e)
         }
 
+@app.get("/health/pools")
+async def pool_metrics():
+    """Connection pool sizes and acquire-wait metrics per workload"""
+    return {
+        "status": "success",
+        "pools": db_manager.pool_metrics()
+    }
+
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,52 @@
+"""
+Recalculate lead scores for every session and user of a site.
+
+Usage (from the Backend directory):
+    python rescore_site.py <site_id> [--chunk-size 1000] [--recount]
+"""
+import argparse
+import asyncio
+import sys
+from config.database import db_manager
+from services.site_registry import site_registry
+from services.lead_scoring_service import LeadScoringService
+
+
+def print_progress(stage: str, done: int, total: int):
+    print(f"\r🔄 Writing {stage}: {done}/{total}", end="\n" if done == total else "", flush=True)
+
+
+async def main(site_id: str, chunk_size: int, recount: bool) -> int:
+    if not await db_manager.connect():
+        return 1
+
+    try:
+        website_id = await site_registry.get_website_id(site_id)
+        if not website_id:
+            print(f"❌ Website not found for site_id: {site_id}")
+            return 1
+
+        summary = await LeadScoringService.rescore_site(
+            website_id, chunk_size=chunk_size, progress=print_progress, recount=recount
+        )
+        if summary is None:
+            print(f"❌ Rescoring failed for site_id: {site_id}")
+            return 1
+
+        print(
+            f"✅ Rescored {summary['sessions_scored']} sessions ({summary['sessions_changed']} changed) and "
+            f"{summary['users_scored']} users in {summary['elapsed_seconds']}s"
+        )
+        return 0
+    finally:
+        await db_manager.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalculate lead scores for a site")
+    parser.add_argument("site_id", help="site_id of the website to rescore")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows written per UPDATE statement")
+    parser.add_argument("--recount", action="store_true",
+                        help="recompute session counters from raw events with the current scoring rules first")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.site_id, max(args.chunk_size, 1), args.recount)))
@@ -1,23 +1,43 @@
-from fastapi import APIRouter, HTTPException
-from services.analytics_service import AnalyticsService
+from fastapi import APIRouter, HTTPException, Query
+from services.analytics_service import AnalyticsService, TimeRange
+from datetime import datetime
+from typing import Optional
 import logging
 
 router = APIRouter(prefix="/api", tags=["analytics"])
 
+
+def _time_range(start: Optional[datetime], end: Optional[datetime], granularity: Optional[str] = None) -> TimeRange:
+    """Validate the from / to / granularity query parameters"""
+    try:
+        return TimeRange.parse(start, end, granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/analytics/{site_id}/metrics")
-async def get_website_metrics(site_id: str):
-    """Get analytics metrics for a specific website"""
+async def get_website_metrics(
+    site_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    granularity: Optional[str] = None
+):
+    """
+    Get analytics metrics for a specific website.
+    Optionally limited to [from, to) (hour resolution); with a granularity
+    (hour, day, week or month) the metrics of each bucket are added as "series".
+    """
     try:
-        metrics = await AnalyticsService.get_website_metrics(site_id)
-        
+        time_range = _time_range(start, end, granularity)
+        metrics = await AnalyticsService.get_website_metrics(site_id, time_range)
+
         if metrics is None:
             raise HTTPException(status_code=404, detail="Website not found")
-        
+
         return {
             "status": "success",
             "metrics": metrics
         }
-        
+
     except HTTPException:
         raise
     except Exception as e:
@@ -25,19 +45,25 @@ async def get_website_metrics(site_id: str):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/analytics/{site_id}/top-pages")
-async def get_top_pages(site_id: str, limit: int = 5):
-    """Get top pages by view count for a specific website"""
+async def get_top_pages(
+    site_id: str,
+    limit: int = 5,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to")
+):
+    """Get top pages by view count for a specific website, optionally within [from, to)"""
     try:
-        top_pages = await AnalyticsService.get_top_pages(site_id, limit)
-        
+        time_range = _time_range(start, end)
+        top_pages = await AnalyticsService.get_top_pages(site_id, limit, time_range)
+
         if top_pages is None:
             raise HTTPException(status_code=404, detail="Website not found")
-        
+
         return {
             "status": "success",
             "top_pages": top_pages
         }
-        
+
     except HTTPException:
         raise
     except Exception as e:
@@ -45,21 +71,106 @@ async def get_top_pages(site_id: str, limit: int = 5):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/analytics/{site_id}/recent-sessions")
-async def get_recent_sessions(site_id: str, limit: int = 10):
-    """Get recent sessions with duration, page count, and lead score"""
+async def get_recent_sessions(
+    site_id: str,
+    limit: int = 10,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to")
+):
+    """Get recent sessions with duration, page count, and lead score, optionally started within [from, to)"""
     try:
-        recent_sessions = await AnalyticsService.get_recent_sessions(site_id, limit)
-        
+        time_range = _time_range(start, end)
+        recent_sessions = await AnalyticsService.get_recent_sessions(site_id, limit, time_range)
+
         if recent_sessions is None:
             raise HTTPException(status_code=404, detail="Website not found")
-        
+
         return {
             "status": "success",
             "recent_sessions": recent_sessions
         }
-        
+
     except HTTPException:
         raise
     except Exception as e:
         logging.error(f"❌ Error fetching recent sessions: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/analytics/{site_id}/sessions")
+async def explore_sessions(
+    site_id: str,
+    limit: int = 25,
+    cursor: Optional[str] = None,
+    browser: Optional[str] = None,
+    os: Optional[str] = None,
+    min_score: Optional[int] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to")
+):
+    """
+    Browse a site's sessions, newest first, optionally filtered by browser,
+    OS, minimum lead score and start time within [from, to).
+    Pass next_cursor from a response to get the next page.
+    """
+    try:
+        time_range = _time_range(start, end)
+
+        try:
+            page = await AnalyticsService.explore_sessions(
+                site_id,
+                limit=min(max(limit, 1), 100),
+                cursor=cursor,
+                browser=browser,
+                os_name=os,
+                min_score=min_score,
+                time_range=time_range
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+        if page is None:
+            raise HTTPException(status_code=404, detail="Website not found")
+
+        return {
+            "status": "success",
+            "sessions": page["sessions"],
+            "next_cursor": page["next_cursor"]
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"❌ Error exploring sessions: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/analytics/{site_id}/dashboard")
+async def get_dashboard(
+    site_id: str,
+    top_pages_limit: int = 5,
+    recent_sessions_limit: int = 10,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    granularity: Optional[str] = None
+):
+    """
+    Get metrics, top pages and recent sessions in one response.
+    Sections are loaded concurrently; one that fails or times out is null
+    and named in "errors" while the others are still returned.
+    """
+    try:
+        time_range = _time_range(start, end, granularity)
+        dashboard = await AnalyticsService.get_dashboard(site_id, top_pages_limit, recent_sessions_limit, time_range)
+
+        if dashboard is None:
+            raise HTTPException(status_code=404, detail="Website not found")
+
+        return {
+            "status": "success",
+            **dashboard
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"❌ Error fetching dashboard: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
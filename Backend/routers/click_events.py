@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Request
 from services.click_event_service import ClickEventService
+from services.page_service import PageService
+from services.event_dedup import event_dedup
 from pydantic import BaseModel
 from typing import Optional
 from uuid import UUID
@@ -19,6 +21,7 @@ class ClickEventRequest(BaseModel):
     elementText: Optional[str] = None
     xCoord: Optional[int] = None
     yCoord: Optional[int] = None
+    eventId: Optional[str] = None  # client event id, makes retries idempotent
 
 
 @router.post("/click-events")
@@ -26,8 +29,12 @@ async def track_click_event(request: ClickEventRequest):
     """
     Track a click event.
     Creates page record if it doesn't exist, then creates click event record.
+    A retried eventId is not stored twice.
     """
     try:
+        if event_dedup.seen(str(request.sessionId), request.eventId):
+            return {"success": True, "message": "Duplicate click event ignored", "duplicate": True}
+
         # Get website_id from site_id
         website_id = await ClickEventService.get_website_id_by_site_id(request.siteId)
         if not website_id:
@@ -37,7 +44,7 @@ async def track_click_event(request: ClickEventRequest):
             )
 
         # Get or create page
-        page_id = await ClickEventService.get_or_create_page(
+        page_id = await PageService.get_or_create_page(
             website_id=website_id,
             url=request.url
         )
@@ -48,6 +55,28 @@ async def track_click_event(request: ClickEventRequest):
                 detail="Failed to create or retrieve page"
             )
 
+        # Queue the click when write-behind buffering is enabled
+        queued = await ClickEventService.buffer_click_event(
+            session_id=request.sessionId,
+            visitor_uuid=request.userId,
+            page_id=page_id,
+            site_id=request.siteId,
+            element_selector=request.elementSelector,
+            element_text=request.elementText,
+            x_coord=request.xCoord,
+            y_coord=request.yCoord,
+            event_id=request.eventId
+        )
+
+        if queued:
+            # The buffer remembers the eventId once the click is flushed
+            return {
+                "success": True,
+                "message": "Click event queued successfully",
+                "click_id": None,
+                "page_id": page_id
+            }
+
         # Create click event
         click_id = await ClickEventService.create_click_event(
             session_id=request.sessionId,
@@ -57,7 +86,8 @@ async def track_click_event(request: ClickEventRequest):
             element_selector=request.elementSelector,
             element_text=request.elementText,
             x_coord=request.xCoord,
-            y_coord=request.yCoord
+            y_coord=request.yCoord,
+            event_id=request.eventId
         )
 
         if not click_id:
@@ -66,6 +96,7 @@ async def track_click_event(request: ClickEventRequest):
                 detail="Failed to create click event"
             )
 
+        event_dedup.remember(str(request.sessionId), request.eventId)
         logger.info(f"Click event tracked successfully: click_id={click_id}, page_id={page_id}")
         
         return {
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, HTTPException, Request
+from services.event_batch_service import EventBatchService
+from services.page_service import PageService
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List
+from uuid import UUID
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["events"])
+
+
+class BatchEvent(BaseModel):
+    type: str  # "page_view", "click" or "session"
+    sessionId: UUID
+    userId: Optional[str] = None  # visitor_uuid from frontend
+    url: Optional[str] = None
+    title: Optional[str] = None
+    referrer: Optional[str] = None
+    elementSelector: Optional[str] = None
+    elementText: Optional[str] = None
+    xCoord: Optional[int] = None
+    yCoord: Optional[int] = None
+    action: Optional[str] = None  # 'start', 'end' or 'update' for session events
+    browser: Optional[str] = None
+    os: Optional[str] = None
+    userAgent: Optional[str] = None
+    sessionDuration: Optional[int] = None
+    eventId: Optional[str] = None  # client event id, makes retries idempotent
+
+
+class EventBatchRequest(BaseModel):
+    siteId: str
+    events: List[BatchEvent]
+
+
+@router.post("/events/batch")
+async def track_event_batch(request: Request):
+    """
+    Track a mixed batch of page view, click and session events for one site.
+    All events are written in a single transaction; the response holds one
+    result per event, in the order the events were sent.
+    """
+    try:
+        # Handle both JSON and sendBeacon (plain text) requests
+        content_type = request.headers.get("content-type", "")
+
+        try:
+            if "application/json" in content_type:
+                data = await request.json()
+            else:
+                body = await request.body()
+                data = json.loads(body.decode('utf-8'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+
+        if not isinstance(data, dict):
+            raise HTTPException(status_code=400, detail="Request body must be a JSON object")
+
+        try:
+            batch = EventBatchRequest(**data)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors())
+
+        if not batch.events:
+            raise HTTPException(status_code=400, detail="No events provided")
+
+        if len(batch.events) > EventBatchService.MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch too large: at most {EventBatchService.MAX_BATCH_SIZE} events allowed"
+            )
+
+        # Get website_id from site_id
+        website_id = await PageService.get_website_id_by_site_id(batch.siteId)
+        if not website_id:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Website not found for site_id: {batch.siteId}"
+            )
+
+        results = await EventBatchService.ingest_batch(
+            website_id=website_id,
+            events=[event.model_dump() for event in batch.events],
+            ip_address=request.client.host if request.client else None
+        )
+
+        if results is None:
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to ingest event batch"
+            )
+
+        accepted = sum(1 for result in results if result["success"])
+        logger.info(f"Event batch tracked: {accepted}/{len(results)} events accepted for site_id={batch.siteId}")
+
+        return {
+            "success": True,
+            "message": f"{accepted} of {len(results)} events tracked",
+            "results": results
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in track_event_batch: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from services.lead_scoring_service import LeadScoringService
+from services.site_registry import site_registry
+from services.scoring_rules import scoring_rules
+from services.live_scores import live_scores
+from services.session_feature_service import SessionFeatureService
+from services.feature_scoring import FeatureModel, evaluate_model
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List, Dict
 from uuid import UUID
+import asyncio
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,6 +26,40 @@ class UserScoreRequest(BaseModel):
     userId: UUID
 
 
+class SessionScoreBatchRequest(BaseModel):
+    sessionIds: List[UUID]
+
+
+class UserScoreBatchRequest(BaseModel):
+    userIds: List[UUID]
+
+
+MAX_SCORE_BATCH_SIZE = 1000
+
+
+class FeatureModelRequest(BaseModel):
+    kind: str = "linear"   # "linear" or "logistic"
+    weights: Dict[str, float]
+    bias: float = 0.0
+    top: int = 20
+
+
+class ScoringRulesRequest(BaseModel):
+    """Scoring rule set of a site; omitted fields keep the default rules"""
+    duration_bands: Optional[List[int]] = None
+    duration_points: Optional[List[int]] = None
+    duration_cap: Optional[int] = None
+    page_points: Optional[int] = None
+    page_patterns: Optional[List[str]] = None
+    page_pattern_points: Optional[List[int]] = None
+    page_cap: Optional[int] = None
+    click_points: Optional[int] = None
+    important_click_points: Optional[int] = None
+    important_texts: Optional[List[str]] = None
+    important_selectors: Optional[List[str]] = None
+    click_cap: Optional[int] = None
+
+
 @router.post("/lead-score/session")
 async def calculate_session_score(request: SessionScoreRequest):
     """
@@ -80,6 +122,80 @@ async def update_session_score(request: SessionScoreRequest):
         )
 
 
+@router.post("/lead-score/sessions/batch")
+async def calculate_session_scores_batch(request: SessionScoreBatchRequest):
+    """
+    Calculate lead scores with their breakdown for many sessions in one request.
+    Unknown session ids are listed under not_found.
+    """
+    try:
+        if len(request.sessionIds) > MAX_SCORE_BATCH_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch too large: at most {MAX_SCORE_BATCH_SIZE} session ids per request"
+            )
+        
+        scores = await LeadScoringService.calculate_session_lead_scores(request.sessionIds)
+        
+        if scores is None:
+            raise HTTPException(
+                status_code=500,
+                detail="Score calculation failed"
+            )
+        
+        return {
+            "success": True,
+            "sessions": scores,
+            "not_found": [str(session_id) for session_id in request.sessionIds if str(session_id) not in scores]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error calculating session scores batch: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
+
+
+@router.post("/lead-score/users/batch")
+async def calculate_user_scores_batch(request: UserScoreBatchRequest):
+    """
+    Get average lead scores for many users in one request.
+    Unknown user ids are listed under not_found.
+    """
+    try:
+        if len(request.userIds) > MAX_SCORE_BATCH_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch too large: at most {MAX_SCORE_BATCH_SIZE} user ids per request"
+            )
+        
+        scores = await LeadScoringService.calculate_user_average_lead_scores(request.userIds)
+        
+        if scores is None:
+            raise HTTPException(
+                status_code=500,
+                detail="Score calculation failed"
+            )
+        
+        return {
+            "success": True,
+            "users": scores,
+            "not_found": [str(user_id) for user_id in request.userIds if str(user_id) not in scores]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error calculating user scores batch: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
+
+
 @router.post("/lead-score/user")
 async def calculate_user_score(request: UserScoreRequest):
     """
@@ -155,41 +271,335 @@ async def get_session_analytics(session_id: UUID):
                 detail=f"Session not found: {session_id}"
             )
         
-        # Calculate score breakdown
-        duration_score = LeadScoringService.calculate_session_duration_score(
-            analytics_data['duration_seconds']
+        # Calculate score breakdown with the session's site rules
+        rules = await scoring_rules.get(analytics_data['website_id'])
+        breakdown = LeadScoringService.build_score_breakdown(analytics_data, rules)
+        
+        return {
+            "success": True,
+            "session_id": str(session_id),
+            "analytics": breakdown["analytics"],
+            "score_breakdown": breakdown["score_breakdown"],
+            "rules_version": breakdown["rules_version"]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting session analytics: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
+
+
+@router.post("/lead-score/{site_id}/rescore")
+async def rescore_site(site_id: str, chunk_size: int = 1000, recount: bool = False):
+    """
+    Recalculate lead scores for every session and user of a site in bulk.
+    Use after changing the scoring weights; pass recount=true to also
+    reclassify past clicks and page views with the current rules.
+    """
+    try:
+        website_id = await site_registry.get_website_id(site_id)
+        if not website_id:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Website not found for site_id: {site_id}"
+            )
+        
+        summary = await LeadScoringService.rescore_site(website_id, chunk_size=max(chunk_size, 1), recount=recount)
+        
+        if summary is None:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Rescoring failed for site_id: {site_id}"
+            )
+        
+        return {
+            "success": True,
+            "site_id": site_id,
+            "summary": summary,
+            "message": f"Rescored {summary['sessions_scored']} sessions and {summary['users_scored']} users"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rescoring site: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
+
+
+@router.get("/lead-score/{site_id}/top")
+async def get_top_leads(
+    site_id: str,
+    limit: int = 20,
+    min_score: int = 0,
+    window_hours: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Get the site's hottest leads, highest lead score first.
+    Optionally only users seen within window_hours and scoring at least
+    min_score; pass next_cursor from a response to get the next page.
+    """
+    try:
+        website_id = await site_registry.get_website_id(site_id)
+        if not website_id:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Website not found for site_id: {site_id}"
+            )
+        
+        try:
+            page = await LeadScoringService.get_top_leads(
+                website_id,
+                limit=min(max(limit, 1), 100),
+                min_score=max(min_score, 0),
+                window_hours=window_hours if window_hours and window_hours > 0 else None,
+                cursor=cursor
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+        
+        if page is None:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to get top leads for site_id: {site_id}"
+            )
+        
+        return {
+            "success": True,
+            "site_id": site_id,
+            "leads": page["leads"],
+            "next_cursor": page["next_cursor"]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting top leads: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
         )
-        page_score = LeadScoringService.calculate_page_views_score(
-            analytics_data['page_views_count']
+
+
+@router.get("/lead-score/{site_id}/rules")
+async def get_scoring_rules(site_id: str):
+    """
+    Get the scoring rule set of a site.
+    """
+    try:
+        website_id = await site_registry.get_website_id(site_id)
+        if not website_id:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Website not found for site_id: {site_id}"
+            )
+        
+        rules = await scoring_rules.get(website_id)
+        
+        return {
+            "success": True,
+            "site_id": site_id,
+            "version": rules.version,
+            "rules": rules.rules
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting scoring rules: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
         )
-        click_score = LeadScoringService.calculate_click_events_score(
-            analytics_data['regular_clicks'],
-            analytics_data['important_clicks']
+
+
+async def _rescore_with_new_rules(site_id: str, website_id: int, version: int):
+    """Background recount and rescore of a site after a rules update"""
+    summary = await LeadScoringService.rescore_site(website_id, recount=True)
+    if summary is None:
+        logger.error(f"Rescoring {site_id} with scoring rules version {version} failed; "
+                     f"retry with POST /api/lead-score/{site_id}/rescore?recount=true")
+    else:
+        logger.info(f"✅ Rescored {site_id} with scoring rules version {version}: {summary}")
+
+
+@router.put("/lead-score/{site_id}/rules", status_code=202)
+async def update_scoring_rules(site_id: str, request: ScoringRulesRequest, background_tasks: BackgroundTasks):
+    """
+    Replace the scoring rule set of a site. All of its sessions are then
+    recounted and rescored with the new rules in the background, so the
+    response (202) does not wait for the rescore.
+    """
+    try:
+        website_id = await site_registry.get_website_id(site_id)
+        if not website_id:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Website not found for site_id: {site_id}"
+            )
+        
+        try:
+            rules = await scoring_rules.update(website_id, request.model_dump())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if rules is None:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to update scoring rules for site_id: {site_id}"
+            )
+        
+        background_tasks.add_task(_rescore_with_new_rules, site_id, website_id, rules.version)
+        
+        return {
+            "success": True,
+            "site_id": site_id,
+            "version": rules.version,
+            "rules": rules.rules,
+            "rescore": "scheduled",
+            "message": f"Scoring rules updated to version {rules.version}; sessions are being rescored"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating scoring rules: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/lead-score/{site_id}/live")
+async def stream_live_scores(site_id: str, request: Request, keepalive: float = 15.0):
+    """
+    Stream live lead scores of a site's in-progress sessions as Server-Sent Events.
+    Sends a "snapshot" event with all active sessions, then a "score" event
+    whenever a session's live score changes or the session ends.
+    """
+    website_id = await site_registry.get_website_id(site_id)
+    if not website_id:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Website not found for site_id: {site_id}"
         )
-        total_score = duration_score + page_score + click_score
+    
+    if not live_scores.enabled:
+        raise HTTPException(
+            status_code=503,
+            detail="Live lead scores are disabled"
+        )
+    
+    queue = live_scores.subscribe(website_id)
+    
+    async def event_stream():
+        try:
+            yield _sse("snapshot", live_scores.snapshot(website_id))
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=max(keepalive, 1.0))
+                    yield _sse("score", event)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            live_scores.unsubscribe(website_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/lead-score/{site_id}/features/backfill")
+async def backfill_session_features(site_id: str, chunk_size: int = 1000):
+    """
+    Compute the stored feature vectors of every session of a site.
+    Needed once for sessions that ended before the feature store existed.
+    """
+    try:
+        website_id = await site_registry.get_website_id(site_id)
+        if not website_id:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Website not found for site_id: {site_id}"
+            )
+        
+        written = await SessionFeatureService.backfill_site(website_id, chunk_size=max(chunk_size, 1))
+        
+        if written is None:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Feature backfill failed for site_id: {site_id}"
+            )
         
         return {
             "success": True,
-            "session_id": str(session_id),
-            "analytics": {
-                "duration_seconds": analytics_data['duration_seconds'],
-                "page_views_count": analytics_data['page_views_count'],
-                "regular_clicks": analytics_data['regular_clicks'],
-                "important_clicks": analytics_data['important_clicks']
-            },
-            "score_breakdown": {
-                "duration_score": f"{duration_score}/{LeadScoringService.MAX_SESSION_SCORE}",
-                "page_score": f"{page_score}/{LeadScoringService.MAX_PAGE_SCORE}",
-                "click_score": f"{click_score}/{LeadScoringService.MAX_CLICK_SCORE}",
-                "total_score": f"{total_score}/100"
-            }
+            "site_id": site_id,
+            "sessions": written,
+            "message": f"Stored features for {written} sessions"
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting session analytics: {e}")
+        logger.error(f"Error backfilling session features: {e}")
         raise HTTPException(
             status_code=500,
             detail="Internal server error"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/lead-score/{site_id}/model/evaluate")
+async def evaluate_feature_model(site_id: str, request: FeatureModelRequest):
+    """
+    Score every stored session feature vector of a site with a linear or
+    logistic model and compare the result with the formula lead scores.
+    """
+    try:
+        website_id = await site_registry.get_website_id(site_id)
+        if not website_id:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Website not found for site_id: {site_id}"
+            )
+        
+        try:
+            model = FeatureModel(request.weights, bias=request.bias, kind=request.kind)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        rows = await SessionFeatureService.get_site_features(website_id)
+        
+        if rows is None:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to load session features for site_id: {site_id}"
+            )
+        
+        return {
+            "success": True,
+            "site_id": site_id,
+            "model": {"kind": model.kind, "weights": request.weights, "bias": model.bias},
+            "evaluation": evaluate_model(model, rows, top=min(max(request.top, 0), 100))
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error evaluating feature model: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Request
 from services.page_service import PageService
+from services.event_dedup import event_dedup
 from pydantic import BaseModel
 from typing import Optional
 from uuid import UUID
@@ -17,15 +18,20 @@ class PageViewRequest(BaseModel):
     url: str
     title: Optional[str] = None
     referrer: Optional[str] = None
+    eventId: Optional[str] = None  # client event id, makes retries idempotent
 
 
 @router.post("/page-views")
 async def track_page_view(request: PageViewRequest):
     """
     Track a page view event.
-    Creates page record if it doesn't exist, then creates page view record.
+    Creates page record if it doesn't exist, then creates page view record,
+    all on a single connection checkout. A retried eventId is not stored twice.
     """
     try:
+        if event_dedup.seen(str(request.sessionId), request.eventId):
+            return {"success": True, "message": "Duplicate page view ignored", "duplicate": True}
+
         # Get website_id from site_id
         website_id = await PageService.get_website_id_by_site_id(request.siteId)
         if not website_id:
@@ -34,34 +40,36 @@ async def track_page_view(request: PageViewRequest):
                 detail=f"Website not found for site_id: {request.siteId}"
             )
 
-        # Get or create page
-        page_id = await PageService.get_or_create_page(
+        # Resolve page, close the previous view and create the new one in one statement
+        result = await PageService.track_page_view(
             website_id=website_id,
-            url=request.url,
-            title=request.title
-        )
-        
-        if not page_id:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to create or retrieve page"
-            )
-
-        # Create page view
-        view_id = await PageService.create_page_view(
             session_id=request.sessionId,
             visitor_uuid=request.userId,
-            page_id=page_id,
-            site_id=request.siteId,
-            referrer=request.referrer
+            url=request.url,
+            title=request.title,
+            referrer=request.referrer,
+            event_id=request.eventId
         )
 
-        if not view_id:
+        if not result:
             raise HTTPException(
                 status_code=500,
                 detail="Failed to create page view"
             )
 
+        view_id = result["view_id"]
+        page_id = result["page_id"]
+        event_dedup.remember(str(request.sessionId), request.eventId)
+
+        if result.get("duplicate"):
+            return {
+                "success": True,
+                "message": "Duplicate page view ignored",
+                "duplicate": True,
+                "view_id": view_id,
+                "page_id": page_id
+            }
+
         logger.info(f"Page view tracked successfully: view_id={view_id}, page_id={page_id}")
         
         return {
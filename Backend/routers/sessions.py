@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Request
 from services.session_service import SessionService
+from services.event_dedup import event_dedup
 import logging
 
 router = APIRouter(prefix="/api", tags=["sessions"])
@@ -22,9 +23,13 @@ async def handle_session(request: Request):
         site_id = data.get('siteId')
         session_id = data.get('sessionId')
         action = data.get('action')  # 'start', 'end', or 'update'
+        event_id = data.get('eventId')  # optional client event id for retried deliveries
         
         if not all([site_id, session_id, action]):
             raise HTTPException(status_code=400, detail="Missing required fields")
+
+        if event_dedup.seen(str(session_id), event_id):
+            return {"status": "success", "message": "Duplicate session event ignored", "duplicate": True}
         
         if action == "start":
             browser = data.get('browser')
@@ -39,7 +44,9 @@ async def handle_session(request: Request):
             
             if not result:
                 raise HTTPException(status_code=500, detail="Failed to start session")
-                
+
+            event_dedup.remember(str(session_id), event_id)
+
             return {"status": "success", "message": "Session started", "session": result}
             
         elif action == "end":
@@ -49,7 +56,8 @@ async def handle_session(request: Request):
             
             if not result:
                 raise HTTPException(status_code=404, detail="Session not found")
-                
+
+            event_dedup.remember(str(session_id), event_id)
             return {"status": "success", "message": "Session ended"}
         
         elif action == "update":
@@ -59,7 +67,8 @@ async def handle_session(request: Request):
             
             if not result:
                 raise HTTPException(status_code=404, detail="Session not found")
-                
+
+            event_dedup.remember(str(session_id), event_id)
             return {"status": "success", "message": "Session updated"}
         
         else:
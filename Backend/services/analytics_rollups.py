@@ -0,0 +1,185 @@
+import os
+import asyncio
+import logging
+from typing import Optional, Dict
+from dotenv import load_dotenv
+from config.database import db_manager
+from services import visitor_sketch
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock held by the instance currently rolling up
+ROLLUP_LOCK_KEY = 72140021
+
+# Consume one chunk of page view and click deltas. Deltas of deleted sites and
+# pages are dropped. Returns the visitors of each site and hour in the chunk
+# with the current sketch (NULL for an hour the chunk adds); the merged
+# sketches are written back with UPDATE_SKETCHES_SQL.
+ROLL_EVENT_DELTAS_SQL = """
+    WITH taken AS (
+        DELETE FROM event_rollup_deltas
+        WHERE delta_id IN (
+            SELECT delta_id FROM event_rollup_deltas ORDER BY delta_id LIMIT $1
+        )
+        RETURNING delta_id, website_id, hour, page_id, views, clicks, visitors
+    ),
+    site AS (
+        INSERT INTO site_hourly_stats (website_id, hour, page_views, clicks)
+        SELECT t.website_id, t.hour, SUM(t.views), SUM(t.clicks)
+        FROM taken t
+        JOIN websites w ON w.website_id = t.website_id
+        GROUP BY t.website_id, t.hour
+        ON CONFLICT (website_id, hour) DO UPDATE SET
+            page_views = site_hourly_stats.page_views + EXCLUDED.page_views,
+            clicks = site_hourly_stats.clicks + EXCLUDED.clicks
+    ),
+    page AS (
+        INSERT INTO page_hourly_stats (website_id, hour, page_id, views, clicks)
+        SELECT t.website_id, t.hour, t.page_id, SUM(t.views), SUM(t.clicks)
+        FROM taken t
+        JOIN pages p ON p.page_id = t.page_id AND p.website_id = t.website_id
+        GROUP BY t.website_id, t.hour, t.page_id
+        ON CONFLICT (website_id, hour, page_id) DO UPDATE SET
+            views = page_hourly_stats.views + EXCLUDED.views,
+            clicks = page_hourly_stats.clicks + EXCLUDED.clicks
+    )
+    SELECT c.website_id, c.hour, c.deltas, c.visitors, h.visitors AS sketch
+    FROM (
+        SELECT t.website_id, t.hour, COUNT(DISTINCT t.delta_id) AS deltas,
+               array_agg(DISTINCT v.user_id) FILTER (WHERE v.user_id IS NOT NULL) AS visitors
+        FROM taken t
+        LEFT JOIN LATERAL unnest(t.visitors) AS v(user_id) ON TRUE
+        GROUP BY t.website_id, t.hour
+    ) c
+    LEFT JOIN site_hourly_stats h ON h.website_id = c.website_id AND h.hour = c.hour
+"""
+
+UPDATE_SKETCHES_SQL = """
+    UPDATE site_hourly_stats h
+    SET visitors = t.visitors
+    FROM unnest($1::int[], $2::timestamp[], $3::bytea[]) AS t(website_id, hour, visitors)
+    WHERE h.website_id = t.website_id AND h.hour = t.hour
+"""
+
+# Consume one chunk of session deltas; deltas of deleted sites are dropped
+ROLL_SESSION_DELTAS_SQL = """
+    WITH taken AS (
+        DELETE FROM session_rollup_deltas
+        WHERE delta_id IN (
+            SELECT delta_id FROM session_rollup_deltas ORDER BY delta_id LIMIT $1
+        )
+        RETURNING website_id, hour, sessions, timed_sessions, viewed_sessions, duration_seconds
+    ),
+    rolled AS (
+        INSERT INTO site_hourly_stats (website_id, hour, sessions, timed_sessions, viewed_sessions, duration_seconds)
+        SELECT t.website_id, t.hour, SUM(t.sessions), SUM(t.timed_sessions),
+               SUM(t.viewed_sessions), SUM(t.duration_seconds)
+        FROM taken t
+        JOIN websites w ON w.website_id = t.website_id
+        GROUP BY t.website_id, t.hour
+        ON CONFLICT (website_id, hour) DO UPDATE SET
+            sessions = site_hourly_stats.sessions + EXCLUDED.sessions,
+            timed_sessions = site_hourly_stats.timed_sessions + EXCLUDED.timed_sessions,
+            viewed_sessions = site_hourly_stats.viewed_sessions + EXCLUDED.viewed_sessions,
+            duration_seconds = site_hourly_stats.duration_seconds + EXCLUDED.duration_seconds
+    )
+    SELECT COUNT(*) FROM taken
+"""
+
+
+class AnalyticsRollupWorker:
+    """
+    Periodically folds new events into the hourly rollup tables.
+
+    Page views, clicks and session changes are read from the delta rows
+    written by the insert and session triggers, in chunks of ROLLUP_BATCH.
+    Deltas are consumed by deleting them, so rows of a transaction that
+    commits late are picked up by the next run. Each run is one transaction
+    under an advisory lock, so several app instances never count the same
+    rows twice. The rollups lag ingest by up to ROLLUP_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("ROLLUP_ENABLED", "true").lower() == "true"
+        self.interval = float(os.getenv("ROLLUP_INTERVAL", "30"))
+        self.batch_size = int(os.getenv("ROLLUP_BATCH", "50000"))
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the periodic rollup"""
+        if not self.enabled:
+            print("ℹ️ Analytics rollups disabled")
+            return
+        self.task = asyncio.create_task(self._run())
+        print(f"✅ Analytics rollup worker started (every {int(self.interval)}s)")
+
+    async def stop(self):
+        """Stop the periodic rollup; a chunk in progress is rolled back and redone next start"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        print("🔌 Analytics rollup worker stopped")
+
+    async def roll_up(self) -> Dict[str, int]:
+        """Roll up everything currently pending. Returns the delta rows consumed per source."""
+        totals = {"event_deltas": 0, "session_deltas": 0}
+        while True:
+            counts = await self._roll_up_chunk()
+            if counts is None:
+                break
+            for source, count in counts.items():
+                totals[source] += count
+            if max(counts.values()) < self.batch_size:
+                break
+
+        if any(totals.values()):
+            logger.info(f"✅ Rolled up {totals}")
+        return totals
+
+    async def _roll_up_chunk(self) -> Optional[Dict[str, int]]:
+        # Background maintenance runs on the ad-hoc pool, not the tracker's ingest pool
+        pool = await db_manager.get_connection("adhoc")
+        async with pool.acquire() as connection:
+            async with connection.transaction():
+                if not await connection.fetchval("SELECT pg_try_advisory_xact_lock($1)", ROLLUP_LOCK_KEY):
+                    # Another instance is rolling up right now
+                    return None
+
+                return {
+                    "event_deltas": await self._roll_up_events(connection),
+                    "session_deltas": await connection.fetchval(ROLL_SESSION_DELTAS_SQL, self.batch_size)
+                }
+
+    async def _roll_up_events(self, connection) -> int:
+        """Fold one chunk of event deltas into the rollups and the hourly visitor sketches"""
+        rows = await connection.fetch(ROLL_EVENT_DELTAS_SQL, self.batch_size)
+        rows_with_visitors = [row for row in rows if row["visitors"]]
+        if rows_with_visitors:
+            sketches = [
+                visitor_sketch.add(visitor_sketch.from_bytes(row["sketch"]), row["visitors"]).tobytes()
+                for row in rows_with_visitors
+            ]
+            await connection.execute(
+                UPDATE_SKETCHES_SQL,
+                [row["website_id"] for row in rows_with_visitors],
+                [row["hour"] for row in rows_with_visitors],
+                sketches
+            )
+        return sum(row["deltas"] for row in rows)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.roll_up()
+            except Exception as e:
+                logger.error(f"Error rolling up analytics: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# Global analytics rollup worker instance
+analytics_rollups = AnalyticsRollupWorker()
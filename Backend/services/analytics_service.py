@@ -1,131 +1,277 @@
-from typing import Optional, Dict, Any, List
+import os
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, NamedTuple, Tuple
+from uuid import UUID
+from dotenv import load_dotenv
 from config.database import db_manager
+from services.site_registry import site_registry
+from services.response_cache import analytics_cache
+from services import visitor_sketch
 import logging
 
+# Load environment variables
+load_dotenv()
+
 logger = logging.getLogger(__name__)
 
+# Longest a dashboard section may take before it is returned empty
+DASHBOARD_SECTION_TIMEOUT = float(os.getenv("DASHBOARD_SECTION_TIMEOUT", "5"))
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+# Dashboard metrics read the hourly rollups (services/analytics_rollups.py), so
+# their cost grows with the hours covered rather than the raw events. All
+# metrics come from one statement; the visitor sketches are merged in Python.
+# Open range ends are +/- infinity so both bounds are always index conditions.
+# With a granularity, the per-bucket rows come with the totals row (total = true).
+SITE_METRICS_SQL = """
+    SELECT GROUPING(date_trunc($4::text, hour)) = 1 AS total,
+           date_trunc($4::text, hour) AS bucket,
+           SUM(page_views) AS page_views,
+           SUM(clicks) AS clicks,
+           SUM(sessions) AS sessions,
+           SUM(timed_sessions) AS timed_sessions,
+           SUM(viewed_sessions) AS viewed_sessions,
+           SUM(duration_seconds) AS duration_seconds,
+           array_agg(visitors) FILTER (WHERE visitors IS NOT NULL) AS visitor_sketches
+    FROM site_hourly_stats
+    WHERE website_id = $1
+    AND hour >= date_trunc('hour', COALESCE($2::timestamp, '-infinity'))
+    AND hour < COALESCE($3::timestamp, 'infinity')
+    GROUP BY GROUPING SETS ((date_trunc($4::text, hour)), ())
+    ORDER BY total DESC, bucket
+"""
+
+TOP_PAGES_SQL = """
+    SELECT
+        p.url,
+        p.title,
+        t.view_count,
+        ROUND(t.view_count * 100.0 / SUM(t.view_count) OVER(), 0) as percentage
+    FROM (
+        SELECT page_id, SUM(views) as view_count
+        FROM page_hourly_stats
+        WHERE website_id = $1
+        AND hour >= date_trunc('hour', COALESCE($3::timestamp, '-infinity'))
+        AND hour < COALESCE($4::timestamp, 'infinity')
+        GROUP BY page_id
+        HAVING SUM(views) > 0
+    ) t
+    JOIN pages p ON p.page_id = t.page_id
+    ORDER BY t.view_count DESC
+    LIMIT $2
+"""
+
+# Walks idx_sessions_website_start_time backwards from the end of the range;
+# page counts come from the session's counter instead of joining page_views
+RECENT_SESSIONS_SQL = """
+    SELECT
+        s.session_id,
+        s.start_time,
+        EXTRACT(EPOCH FROM s.session_duration) as duration_seconds,
+        s.lead_score,
+        s.page_view_count as page_count
+    FROM sessions s
+    WHERE s.website_id = $1
+    AND s.start_time >= COALESCE($3::timestamp, '-infinity')
+    AND s.start_time < COALESCE($4::timestamp, 'infinity')
+    ORDER BY s.start_time DESC
+    LIMIT $2
+"""
+
+# Keyset pages of the session explorer, newest first. The first page and the
+# pages after a cursor are separate statements, so the (start_time, session_id)
+# row comparison is always an index condition on idx_sessions_website_start_time,
+# also once asyncpg's cached statement gets a generic plan. ($8, $9) is the last
+# (start_time, session_id) of the previous page. Counts come from the session
+# counters. The browser, OS and score filters are not index columns, so they
+# are checked on each session row fetched along the index: a page costs the
+# same however deep it is, but a selective filter on a large site reads many
+# rows per page.
+EXPLORE_SESSIONS_TEMPLATE = """
+    SELECT
+        s.session_id,
+        s.user_id,
+        s.start_time,
+        s.end_time,
+        EXTRACT(EPOCH FROM s.session_duration) as duration_seconds,
+        s.browser,
+        s.os,
+        s.lead_score,
+        s.page_view_count,
+        s.regular_click_count + s.important_click_count as click_count
+    FROM sessions s
+    WHERE s.website_id = $1
+    AND ($2::text IS NULL OR s.browser = $2)
+    AND ($3::text IS NULL OR s.os = $3)
+    AND ($4::int IS NULL OR s.lead_score >= $4)
+    AND s.start_time >= COALESCE($5::timestamp, '-infinity')
+    AND s.start_time < COALESCE($6::timestamp, 'infinity'){after}
+    ORDER BY s.start_time DESC, s.session_id DESC
+    LIMIT $7
+"""
+
+EXPLORE_SESSIONS_SQL = EXPLORE_SESSIONS_TEMPLATE.format(after="")
+
+EXPLORE_SESSIONS_AFTER_SQL = EXPLORE_SESSIONS_TEMPLATE.format(
+    after="\n    AND (s.start_time, s.session_id) < ($8::timestamp, $9::uuid)"
+)
+
+
+class TimeRange(NamedTuple):
+    """Requested time range: naive UTC bounds (start inclusive, end exclusive) and series granularity"""
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    granularity: Optional[str] = None
+
+    @classmethod
+    def parse(
+        cls,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        granularity: Optional[str] = None
+    ) -> "TimeRange":
+        """
+        Validate and normalize range parameters.
+
+        Raises:
+            ValueError: If the range is empty or the granularity is unknown
+        """
+        def to_utc(value: Optional[datetime]) -> Optional[datetime]:
+            # Timestamps are stored as naive UTC (database NOW())
+            if value is None or value.tzinfo is None:
+                return value
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+        start, end = to_utc(start), to_utc(end)
+        if start is not None and end is not None and start >= end:
+            raise ValueError("'from' must be before 'to'")
+        if granularity is not None and granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+        return cls(start, end, granularity)
+
+
+ALL_TIME = TimeRange()
+
+
+def format_duration(duration_seconds: float) -> str:
+    """Format a duration as minutes and seconds"""
+    minutes = int(duration_seconds // 60)
+    seconds = int(duration_seconds % 60)
+    return f"{minutes}m {seconds}s"
+
+
+def encode_session_cursor(start_time: datetime, session_id: UUID) -> str:
+    """Explorer cursor of the page after the session (start_time, session_id)"""
+    return f"{start_time.isoformat()}_{session_id}"
+
+
+def decode_session_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    (start_time, session_id) of an explorer cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    start_part, _, session_part = cursor.partition("_")
+    return datetime.fromisoformat(start_part), UUID(session_part)
+
+
+def metrics_from_row(row) -> Dict[str, Any]:
+    """Dashboard metrics of one (totals or bucket) row of SITE_METRICS_SQL"""
+    total_views = row["page_views"] or 0
+    unique_visitors = visitor_sketch.estimate(visitor_sketch.merge(row["visitor_sketches"] or []))
+    avg_duration_seconds = (row["duration_seconds"] or 0) / row["timed_sessions"] if row["timed_sessions"] else 0
+    avg_pages = total_views / row["viewed_sessions"] if row["viewed_sessions"] else 0
+
+    return {
+        "total_page_views": total_views,
+        "unique_visitors": unique_visitors,
+        "sessions": row["sessions"] or 0,
+        "clicks": row["clicks"] or 0,
+        "avg_session_duration": format_duration(avg_duration_seconds),
+        "avg_session_duration_seconds": avg_duration_seconds,
+        "pages_per_session": round(avg_pages, 1) if avg_pages else 0
+    }
+
+
 class AnalyticsService:
     @staticmethod
-    async def get_website_metrics(site_id: str) -> Optional[Dict[str, Any]]:
-        """Get analytics metrics for a specific website"""
+    async def get_website_metrics(site_id: str, time_range: TimeRange = ALL_TIME) -> Optional[Dict[str, Any]]:
+        """Get analytics metrics for a specific website (cached per site and range)"""
+        try:
+            # Get website_id first
+            website_id = await site_registry.get_website_id(site_id)
+
+            if not website_id:
+                return None
+
+            return await analytics_cache.get(
+                website_id, ("metrics", time_range),
+                lambda: AnalyticsService._load_website_metrics(website_id, time_range)
+            )
+
+        except Exception as e:
+            logger.error(f"Error getting website metrics: {e}")
+            return None
+
+    @staticmethod
+    async def _load_website_metrics(website_id: int, time_range: TimeRange = ALL_TIME) -> Optional[Dict[str, Any]]:
+        """
+        Compute a site's metrics from the hourly rollups in one round trip.
+        Ranges have hour resolution; with a granularity, the metrics of each
+        bucket are returned under "series".
+        """
         try:
-            pool = await db_manager.get_connection()
+            pool = await db_manager.get_connection("dashboard")
             async with pool.acquire() as connection:
-                # Get website_id first
-                website_result = await connection.fetchrow(
-                    "SELECT website_id FROM websites WHERE site_id = $1",
-                    site_id
+                rows = await connection.fetch(
+                    SITE_METRICS_SQL,
+                    website_id, time_range.start, time_range.end, time_range.granularity
                 )
-                
-                if not website_result:
-                    return None
-                
-                website_id = website_result["website_id"]
-                
-                # Get total page views
-                page_views_result = await connection.fetchrow(
-                    """
-                    SELECT COUNT(*) as total_views
-                    FROM page_views pv
-                    JOIN sessions s ON pv.session_id = s.session_id
-                    WHERE s.website_id = $1
-                    """,
-                    website_id
-                )
-                
-                # Get unique visitors
-                unique_visitors_result = await connection.fetchrow(
-                    """
-                    SELECT COUNT(DISTINCT u.user_id) as unique_visitors
-                    FROM users u
-                    WHERE u.website_id = $1
-                    """,
-                    website_id
-                )
-                
-                # Get average session duration
-                avg_duration_result = await connection.fetchrow(
-                    """
-                    SELECT AVG(EXTRACT(EPOCH FROM session_duration)) as avg_duration_seconds
-                    FROM sessions
-                    WHERE website_id = $1 AND session_duration IS NOT NULL
-                    """,
-                    website_id
-                )
-                
-                # Get pages per session
-                pages_per_session_result = await connection.fetchrow(
-                    """
-                    SELECT AVG(page_count) as avg_pages_per_session
-                    FROM (
-                        SELECT COUNT(*) as page_count
-                        FROM page_views pv
-                        JOIN sessions s ON pv.session_id = s.session_id
-                        WHERE s.website_id = $1
-                        GROUP BY pv.session_id
-                    ) session_pages
-                    """,
-                    website_id
-                )
-                
-                # Format the results
-                total_views = page_views_result["total_views"] or 0
-                unique_visitors = unique_visitors_result["unique_visitors"] or 0
-                avg_duration_seconds = avg_duration_result["avg_duration_seconds"] or 0
-                avg_pages = pages_per_session_result["avg_pages_per_session"] or 0
-                
-                # Format duration as minutes and seconds
-                minutes = int(avg_duration_seconds // 60)
-                seconds = int(avg_duration_seconds % 60)
-                duration_formatted = f"{minutes}m {seconds}s"
-                
-                return {
-                    "total_page_views": total_views,
-                    "unique_visitors": unique_visitors,
-                    "avg_session_duration": duration_formatted,
-                    "avg_session_duration_seconds": avg_duration_seconds,
-                    "pages_per_session": round(avg_pages, 1) if avg_pages else 0
-                }
-                
+
+            metrics = metrics_from_row(rows[0])
+            if time_range.granularity:
+                metrics["series"] = [
+                    {"bucket": row["bucket"].isoformat(), **metrics_from_row(row)}
+                    for row in rows[1:]
+                ]
+            return metrics
+
         except Exception as e:
             logger.error(f"Error getting website metrics: {e}")
             return None
 
     @staticmethod
-    async def get_top_pages(site_id: str, limit: int = 5) -> Optional[List[Dict[str, Any]]]:
-        """Get top pages by view count for a specific website"""
+    async def get_top_pages(site_id: str, limit: int = 5, time_range: TimeRange = ALL_TIME) -> Optional[List[Dict[str, Any]]]:
+        """Get top pages by view count for a specific website (cached per site and range)"""
+        try:
+            # Get website_id first
+            website_id = await site_registry.get_website_id(site_id)
+
+            if not website_id:
+                return None
+
+            return await analytics_cache.get(
+                website_id, ("top_pages", limit, time_range),
+                lambda: AnalyticsService._load_top_pages(website_id, limit, time_range)
+            )
+
+        except Exception as e:
+            logger.error(f"Error getting top pages: {e}")
+            return None
+
+    @staticmethod
+    async def _load_top_pages(website_id: int, limit: int, time_range: TimeRange = ALL_TIME) -> Optional[List[Dict[str, Any]]]:
+        """Rank a site's pages by views from the hourly page rollups"""
         try:
-            pool = await db_manager.get_connection()
+            pool = await db_manager.get_connection("dashboard")
             async with pool.acquire() as connection:
-                # Get website_id first
-                website_result = await connection.fetchrow(
-                    "SELECT website_id FROM websites WHERE site_id = $1",
-                    site_id
-                )
-                
-                if not website_result:
-                    return None
-                
-                website_id = website_result["website_id"]
-                
-                # Get top pages with view counts
                 results = await connection.fetch(
-                    """
-                    SELECT 
-                        p.url,
-                        p.title,
-                        COUNT(pv.view_id) as view_count,
-                        ROUND(COUNT(pv.view_id) * 100.0 / SUM(COUNT(pv.view_id)) OVER(), 0) as percentage
-                    FROM pages p
-                    LEFT JOIN page_views pv ON p.page_id = pv.page_id
-                    WHERE p.website_id = $1
-                    GROUP BY p.page_id, p.url, p.title
-                    ORDER BY view_count DESC
-                    LIMIT $2
-                    """,
-                    website_id, limit
+                    TOP_PAGES_SQL, website_id, limit, time_range.start, time_range.end
                 )
-                
+
                 top_pages = []
                 for result in results:
                     # Use title if available, otherwise fall back to URL
@@ -136,66 +282,170 @@ class AnalyticsService:
                         "views": result["view_count"],
                         "percentage": int(result["percentage"]) if result["percentage"] else 0
                     })
-                
+
                 return top_pages
-                
+
         except Exception as e:
             logger.error(f"Error getting top pages: {e}")
             return None
 
     @staticmethod
-    async def get_recent_sessions(site_id: str, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+    async def get_recent_sessions(site_id: str, limit: int = 10, time_range: TimeRange = ALL_TIME) -> Optional[List[Dict[str, Any]]]:
         """Get recent sessions with duration, page count, and lead score"""
         try:
-            pool = await db_manager.get_connection()
+            # Get website_id first
+            website_id = await site_registry.get_website_id(site_id)
+
+            if not website_id:
+                return None
+
+            return await AnalyticsService._load_recent_sessions(website_id, limit, time_range)
+
+        except Exception as e:
+            logger.error(f"Error getting recent sessions: {e}")
+            return None
+
+    @staticmethod
+    async def _load_recent_sessions(website_id: int, limit: int, time_range: TimeRange = ALL_TIME) -> Optional[List[Dict[str, Any]]]:
+        """Latest sessions of a site (started within the range) with their page counts"""
+        try:
+            pool = await db_manager.get_connection("dashboard")
             async with pool.acquire() as connection:
-                # Get website_id first
-                website_result = await connection.fetchrow(
-                    "SELECT website_id FROM websites WHERE site_id = $1",
-                    site_id
-                )
-                
-                if not website_result:
-                    return None
-                
-                website_id = website_result["website_id"]
-                
-                # Get recent sessions with page counts
                 results = await connection.fetch(
-                    """
-                    SELECT 
-                        s.session_id,
-                        s.start_time,
-                        EXTRACT(EPOCH FROM s.session_duration) as duration_seconds,
-                        s.lead_score,
-                        COUNT(pv.view_id) as page_count
-                    FROM sessions s
-                    LEFT JOIN page_views pv ON s.session_id = pv.session_id
-                    WHERE s.website_id = $1
-                    GROUP BY s.session_id, s.start_time, s.session_duration, s.lead_score
-                    ORDER BY s.start_time DESC
-                    LIMIT $2
-                    """,
-                    website_id, limit
+                    RECENT_SESSIONS_SQL, website_id, limit, time_range.start, time_range.end
                 )
-                
+
                 recent_sessions = []
                 for result in results:
-                    # Format duration
-                    duration_seconds = result["duration_seconds"] or 0
-                    minutes = int(duration_seconds // 60)
-                    seconds = int(duration_seconds % 60)
-                    duration_formatted = f"{minutes}m {seconds}s"
-                    
                     recent_sessions.append({
                         "session_id": str(result["session_id"]),
-                        "duration": duration_formatted,
+                        "duration": format_duration(result["duration_seconds"] or 0),
                         "pages": result["page_count"] or 0,
                         "lead_score": result["lead_score"] or 0
                     })
-                
+
                 return recent_sessions
-                
+
         except Exception as e:
             logger.error(f"Error getting recent sessions: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    @staticmethod
+    async def explore_sessions(
+        site_id: str,
+        limit: int = 25,
+        cursor: Optional[str] = None,
+        browser: Optional[str] = None,
+        os_name: Optional[str] = None,
+        min_score: Optional[int] = None,
+        time_range: TimeRange = ALL_TIME
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get a page of a site's sessions, newest first.
+
+        Args:
+            site_id: Public site id
+            limit: Page size
+            cursor: next_cursor of the previous page
+            browser: Only sessions with this browser
+            os_name: Only sessions with this operating system
+            min_score: Only sessions with at least this lead score
+            time_range: Only sessions started within the range
+
+        Returns:
+            Dictionary with the sessions and the cursor of the next page, or None
+            if the site is unknown or on error
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        after = decode_session_cursor(cursor) if cursor else ()
+
+        try:
+            website_id = await site_registry.get_website_id(site_id)
+
+            if not website_id:
+                return None
+
+            pool = await db_manager.get_connection("dashboard")
+            async with pool.acquire() as connection:
+                rows = await connection.fetch(
+                    EXPLORE_SESSIONS_AFTER_SQL if after else EXPLORE_SESSIONS_SQL,
+                    website_id, browser, os_name, min_score, time_range.start, time_range.end,
+                    limit, *after
+                )
+
+            sessions = [
+                {
+                    "session_id": str(row["session_id"]),
+                    "user_id": str(row["user_id"]) if row["user_id"] else None,
+                    "start_time": row["start_time"].isoformat(),
+                    "end_time": row["end_time"].isoformat() if row["end_time"] else None,
+                    "duration": format_duration(row["duration_seconds"] or 0),
+                    "duration_seconds": row["duration_seconds"] or 0,
+                    "browser": row["browser"],
+                    "os": row["os"],
+                    "pages": row["page_view_count"],
+                    "clicks": row["click_count"],
+                    "lead_score": row["lead_score"] or 0
+                }
+                for row in rows
+            ]
+
+            next_cursor = None
+            if len(rows) == limit:
+                next_cursor = encode_session_cursor(rows[-1]["start_time"], rows[-1]["session_id"])
+
+            return {"sessions": sessions, "next_cursor": next_cursor}
+
+        except Exception as e:
+            logger.error(f"Error exploring sessions: {e}")
+            return None
+
+    @staticmethod
+    async def get_dashboard(
+        site_id: str,
+        top_pages_limit: int = 5,
+        recent_sessions_limit: int = 10,
+        time_range: TimeRange = ALL_TIME
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get metrics, top pages and recent sessions of a website in one call.
+
+        The sections run concurrently, each on its own dashboard pool
+        connection, and each is bounded by DASHBOARD_SECTION_TIMEOUT. A section
+        that fails or times out is returned as None and listed in "errors",
+        without holding back the others.
+        """
+        website_id = await site_registry.get_website_id(site_id)
+        if not website_id:
+            return None
+
+        sections = {
+            "metrics": analytics_cache.get(
+                website_id, ("metrics", time_range),
+                lambda: AnalyticsService._load_website_metrics(website_id, time_range)
+            ),
+            "top_pages": analytics_cache.get(
+                website_id, ("top_pages", top_pages_limit, time_range),
+                lambda: AnalyticsService._load_top_pages(website_id, top_pages_limit, time_range)
+            ),
+            "recent_sessions": AnalyticsService._load_recent_sessions(website_id, recent_sessions_limit, time_range),
+        }
+        results = await asyncio.gather(
+            *[asyncio.wait_for(section, DASHBOARD_SECTION_TIMEOUT) for section in sections.values()],
+            return_exceptions=True
+        )
+
+        dashboard: Dict[str, Any] = {"errors": {}}
+        for name, result in zip(sections, results):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning(f"Dashboard section {name} timed out for website {website_id}")
+                dashboard["errors"][name] = "timeout"
+            elif isinstance(result, Exception):
+                logger.error(f"Error loading dashboard section {name}: {result}")
+                dashboard["errors"][name] = "failed"
+            elif result is None:
+                dashboard["errors"][name] = "failed"
+            dashboard[name] = None if name in dashboard["errors"] else result
+        return dashboard
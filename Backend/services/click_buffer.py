@@ -0,0 +1,145 @@
+import os
+import asyncio
+import logging
+from typing import Optional, List, Tuple
+from uuid import UUID
+from dotenv import load_dotenv
+from config.database import db_manager
+from services.event_dedup import event_dedup
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ClickRecord = Tuple[UUID, UUID, int, str, Optional[str], Optional[int], Optional[int], Optional[str]]
+
+
+class ClickEventBuffer:
+    """
+    Optional write-behind buffer for click events.
+
+    Clicks are queued in-process and written with COPY when either the batch
+    size or the flush interval is reached. The queue is bounded: when it is
+    full, callers fall back to the synchronous insert. Rows get their
+    click_time from the database default, so it lags the real click by at
+    most the flush interval. A batch holding an already stored client event
+    id fails COPY and is retried row by row, skipping the duplicates. Client
+    event ids are only remembered for deduplication once their row is written,
+    so a click lost in a failed flush can still be retried by the tracker.
+    """
+
+    COLUMNS = ["session_id", "user_id", "page_id", "element_selector", "element_text", "x_coord", "y_coord", "event_id"]
+
+    def __init__(self):
+        self.enabled = os.getenv("CLICK_BUFFER_ENABLED", "false").lower() == "true"
+        self.max_batch_size = int(os.getenv("CLICK_BUFFER_MAX_BATCH", "500"))
+        self.flush_interval = float(os.getenv("CLICK_BUFFER_FLUSH_INTERVAL", "1.0"))
+        self.max_queue_size = int(os.getenv("CLICK_BUFFER_MAX_QUEUE", "10000"))
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.flush_task: Optional[asyncio.Task] = None
+        self.closing = False
+
+    async def start(self):
+        """Start the background flush task (no-op when buffering is disabled)"""
+        if not self.enabled:
+            return
+
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.closing = False
+        self.flush_task = asyncio.create_task(self._run())
+        print(f"✅ Click event buffer started (batch={self.max_batch_size}, interval={self.flush_interval}s)")
+
+    async def stop(self):
+        """Stop accepting clicks and wait until everything queued has been flushed"""
+        if not self.flush_task:
+            return
+
+        self.closing = True
+        pending = self.queue.qsize()
+        await self.flush_task
+
+        self.flush_task = None
+        self.queue = None
+        print(f"🔌 Click event buffer drained ({pending} clicks flushed on shutdown)")
+
+    def enqueue(self, record: ClickRecord) -> bool:
+        """Queue a click for the next flush. Returns False if the buffer is off, closing or full."""
+        if not self.queue or self.closing:
+            return False
+
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            logger.warning("Click event buffer full, falling back to direct insert")
+            return False
+
+    async def _run(self):
+        """Collect clicks until the batch is full or the flush interval elapses, then flush"""
+        loop = asyncio.get_running_loop()
+        while not (self.closing and self.queue.empty()):
+            batch: List[ClickRecord] = []
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.max_batch_size:
+                if self.closing and self.queue.empty():
+                    break
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[ClickRecord]):
+        """Write a batch with COPY, isolating bad rows with single inserts if COPY fails"""
+        if not batch:
+            return
+
+        try:
+            pool = await db_manager.get_connection()
+            async with pool.acquire() as connection:
+                try:
+                    await connection.copy_records_to_table(
+                        "click_events", records=batch, columns=self.COLUMNS
+                    )
+                    self._remember(batch)
+                    logger.info(f"Flushed {len(batch)} buffered click events")
+                    return
+                except Exception as e:
+                    logger.warning(f"COPY of {len(batch)} click events failed, retrying row by row: {e}")
+
+                written = []
+                for record in batch:
+                    try:
+                        await connection.execute(
+                            """
+                            INSERT INTO click_events (session_id, user_id, page_id, element_selector, element_text, x_coord, y_coord, event_id)
+                            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                            ON CONFLICT (session_id, event_id) DO NOTHING
+                            """,
+                            *record
+                        )
+                        written.append(record)
+                    except Exception as e:
+                        logger.error(f"Dropping buffered click event for session {record[0]}: {e}")
+                self._remember(written)
+                logger.info(f"Flushed {len(written)}/{len(batch)} buffered click events")
+
+        except Exception as e:
+            logger.error(f"Error flushing click event buffer: {e}")
+
+    @staticmethod
+    def _remember(records: List[ClickRecord]):
+        """Record the client event ids of written clicks"""
+        for record in records:
+            event_dedup.remember(str(record[0]), record[7])
+
+
+# Global click event buffer instance
+click_buffer = ClickEventBuffer()
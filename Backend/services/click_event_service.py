@@ -1,10 +1,26 @@
 from typing import Optional
 from uuid import UUID
 from config.database import db_manager
+from config.statements import statements
+from services.site_registry import site_registry
+from services.identity_cache import identity_cache
+from services.click_buffer import click_buffer
+from services.live_scores import live_scores
 import logging
 
 logger = logging.getLogger(__name__)
 
+INSERT_CLICK_SQL = statements.register("""
+    INSERT INTO click_events (session_id, user_id, page_id, element_selector, element_text, x_coord, y_coord, event_id) 
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8) 
+    ON CONFLICT (session_id, event_id) DO NOTHING
+    RETURNING click_id
+""")
+
+EXISTING_CLICK_SQL = statements.register("""
+    SELECT click_id FROM click_events WHERE session_id = $1 AND event_id = $2
+""")
+
 
 class ClickEventService:
     @staticmethod
@@ -16,106 +32,100 @@ class ClickEventService:
         element_selector: str,
         element_text: Optional[str] = None,
         x_coord: Optional[int] = None,
-        y_coord: Optional[int] = None
+        y_coord: Optional[int] = None,
+        event_id: Optional[str] = None
     ) -> Optional[int]:
         """
-        Create a new click event record.
+        Create a new click event record. If event_id was already stored for the
+        session, the original click_id is returned and nothing is inserted.
         """
         try:
+            # Resolve the site first: a registry miss checks out a connection of its own
+            website_id = await site_registry.get_website_id(site_id)
+            if not website_id:
+                logger.error(f"Website not found for site_id: {site_id}")
+                return None
+
             pool = await db_manager.get_connection()
             async with pool.acquire() as connection:
                 # Get the database user_id from visitor_uuid
-                user_result = await connection.fetchrow(
-                    """
-                    SELECT u.user_id 
-                    FROM users u
-                    JOIN websites w ON u.website_id = w.website_id
-                    WHERE w.site_id = $1 AND u.visitor_uuid = $2
-                    """,
-                    site_id, str(visitor_uuid)
-                )
+                db_user_id = await identity_cache.get_user_id(website_id, visitor_uuid, connection)
                 
-                if not user_result:
+                if not db_user_id:
                     logger.error(f"User not found for visitor_uuid: {visitor_uuid} and site_id: {site_id}")
                     return None
-                
-                db_user_id = user_result["user_id"]
 
                 # Create new click event
-                result = await connection.fetchrow(
-                    """
-                    INSERT INTO click_events (session_id, user_id, page_id, element_selector, element_text, x_coord, y_coord) 
-                    VALUES ($1, $2, $3, $4, $5, $6, $7) 
-                    RETURNING click_id
-                    """,
-                    session_id, db_user_id, page_id, element_selector, element_text, x_coord, y_coord
+                result = await statements.fetchrow(
+                    connection, INSERT_CLICK_SQL,
+                    session_id, db_user_id, page_id, element_selector, element_text, x_coord, y_coord, event_id
                 )
-                
-                if result:
-                    click_id = result["click_id"]
-                    logger.info(f"Created click event: {click_id} for element: {element_selector}")
-                    return click_id
+                if not result and event_id:
+                    return await statements.fetchval(connection, EXISTING_CLICK_SQL, session_id, event_id)
 
+            if not result:
                 return None
 
+            click_id = result["click_id"]
+            logger.info(f"Created click event: {click_id} for element: {element_selector}")
+            # After releasing the connection: a rules cache miss checks out one of its own
+            await live_scores.clicked(website_id, session_id, element_selector, element_text)
+            return click_id
+
         except Exception as e:
             logger.error(f"Error creating click event: {e}")
             return None
 
     @staticmethod
-    async def get_website_id_by_site_id(site_id: str) -> Optional[int]:
+    async def buffer_click_event(
+        session_id: UUID, 
+        visitor_uuid: UUID, 
+        page_id: int, 
+        site_id: str,
+        element_selector: str,
+        element_text: Optional[str] = None,
+        x_coord: Optional[int] = None,
+        y_coord: Optional[int] = None,
+        event_id: Optional[str] = None
+    ) -> bool:
         """
-        Get website_id from site_id for page lookup.
+        Queue a click event on the write-behind buffer instead of inserting it.
+        Returns False if the user is unknown or the buffer cannot take the click,
+        in which case the caller should fall back to create_click_event.
         """
+        if not click_buffer.enabled:
+            return False
+
         try:
-            pool = await db_manager.get_connection()
-            async with pool.acquire() as connection:
-                result = await connection.fetchrow(
-                    "SELECT website_id FROM websites WHERE site_id = $1",
-                    site_id
-                )
+            # Get the database user_id from visitor_uuid (no round trip when cached)
+            website_id = await site_registry.get_website_id(site_id)
+            db_user_id = None
+            if website_id:
+                db_user_id = await identity_cache.get_user_id(website_id, visitor_uuid)
 
-                return result["website_id"] if result else None
+            if not db_user_id:
+                logger.error(f"User not found for visitor_uuid: {visitor_uuid} and site_id: {site_id}")
+                return False
+
+            queued = click_buffer.enqueue(
+                (session_id, db_user_id, page_id, element_selector, element_text, x_coord, y_coord, event_id)
+            )
+            if queued:
+                await live_scores.clicked(website_id, session_id, element_selector, element_text)
+            return queued
 
         except Exception as e:
-            logger.error(f"Error getting website_id: {e}")
-            return None
+            logger.error(f"Error buffering click event: {e}")
+            return False
 
     @staticmethod
-    async def get_or_create_page(website_id: int, url: str) -> Optional[int]:
+    async def get_website_id_by_site_id(site_id: str) -> Optional[int]:
         """
-        Get existing page or create new one. Returns page_id.
-        Reused from PageService logic for consistency.
+        Get website_id from site_id for page lookup.
         """
         try:
-            pool = await db_manager.get_connection()
-            async with pool.acquire() as connection:
-                # Try to get existing page
-                result = await connection.fetchrow(
-                    "SELECT page_id FROM pages WHERE website_id = $1 AND url = $2",
-                    website_id, url
-                )
-
-                if result:
-                    return result["page_id"]
-
-                # Create new page (without title for click events)
-                result = await connection.fetchrow(
-                    """
-                    INSERT INTO pages (website_id, url) 
-                    VALUES ($1, $2) 
-                    RETURNING page_id
-                    """,
-                    website_id, url
-                )
-                
-                if result:
-                    page_id = result["page_id"]
-                    logger.info(f"Created new page: {page_id} for URL: {url}")
-                    return page_id
-
-                return None
+            return await site_registry.get_website_id(site_id)
 
         except Exception as e:
-            logger.error(f"Error creating/getting page: {e}")
-            return None
\ No newline at end of file
+            logger.error(f"Error getting website_id: {e}")
+            return None
@@ -0,0 +1,470 @@
+from typing import Optional, Dict, Any, List
+from uuid import UUID
+from config.database import db_manager
+from services.lead_scoring_service import LeadScoringService
+from services.scoring_worker import scoring_worker
+from services.page_resolver import page_resolver
+from services.identity_cache import identity_cache
+from services.live_scores import live_scores
+from services.event_dedup import event_dedup
+from services.scoring_rules import scoring_rules
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EventBatchService:
+    """
+    Service for writing a mixed batch of tracker events for one site.
+
+    All page views, click events and session events of a batch are written
+    in a single transaction on one connection, using one multi-row statement
+    per event kind instead of one round trip per event.
+
+    Events carrying a client eventId are written at most once per session:
+    recently seen ids and repeats within the batch are dropped up front, and
+    page views and clicks already stored are skipped by their unique key.
+    Duplicates report success with duplicate set.
+    """
+
+    MAX_BATCH_SIZE = 500
+
+    @staticmethod
+    async def ingest_batch(
+        website_id: int,
+        events: List[Dict[str, Any]],
+        ip_address: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Write a batch of events and return one result per event, in input order.
+
+        Each result keeps the semantics of the matching single-event service:
+        page views and clicks need a known visitor and session, a new page view
+        closes the previous open view of its session, and ending a session
+        closes its open page views and triggers lead scoring.
+
+        Args:
+            website_id: Database id of the site all events belong to
+            events: Event dictionaries as sent by the tracker
+            ip_address: Client address recorded on started sessions
+
+        Returns:
+            List of per-event result dictionaries or None if the batch failed
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(events)
+        starts, page_views, clicks, updates, ends = [], [], [], {}, {}
+        batch_event_ids = set()
+
+        for index, event in enumerate(events):
+            event_id = event.get("eventId")
+            if event_id:
+                key = (str(event.get("sessionId")), event_id)
+                if key in batch_event_ids or event_dedup.seen(*key):
+                    results[index] = EventBatchService._duplicate(index, event)
+                    continue
+                batch_event_ids.add(key)
+
+            event_type = event.get("type")
+            action = event.get("action")
+            if event_type == "page_view" and event.get("url"):
+                page_views.append(index)
+            elif event_type == "click" and event.get("url") and event.get("elementSelector"):
+                clicks.append(index)
+            elif event_type == "session" and action == "start":
+                starts.append(index)
+            elif event_type == "session" and action == "update":
+                updates[str(event["sessionId"])] = index
+            elif event_type == "session" and action == "end":
+                ends[str(event["sessionId"])] = index
+            else:
+                results[index] = EventBatchService._error(index, event, "Invalid or incomplete event")
+
+        try:
+            pool = await db_manager.get_connection()
+            async with pool.acquire() as connection:
+                async with connection.transaction():
+                    visitor_uuids = {
+                        str(events[i]["userId"])
+                        for i in starts + page_views + clicks
+                        if events[i].get("userId")
+                    }
+                    user_ids = await identity_cache.get_user_ids(
+                        connection, website_id, visitor_uuids
+                    )
+
+                    await EventBatchService._start_sessions(
+                        connection, website_id, events, starts, user_ids, ip_address, results
+                    )
+
+                    known_sessions = await EventBatchService._resolve_sessions(
+                        connection, {str(events[i]["sessionId"]) for i in page_views + clicks}
+                    )
+                    page_views = EventBatchService._filter_resolvable(
+                        events, page_views, user_ids, known_sessions, results
+                    )
+                    clicks = EventBatchService._filter_resolvable(
+                        events, clicks, user_ids, known_sessions, results
+                    )
+                    page_views = await EventBatchService._drop_stored(
+                        connection, "page_views", events, page_views, results
+                    )
+                    clicks = await EventBatchService._drop_stored(
+                        connection, "click_events", events, clicks, results
+                    )
+
+                    page_ids = await page_resolver.get_page_ids(
+                        connection, website_id,
+                        [(events[i]["url"], events[i].get("title")) for i in page_views + clicks]
+                    )
+
+                    await EventBatchService._insert_page_views(
+                        connection, events, page_views, user_ids, page_ids, results
+                    )
+                    await EventBatchService._insert_click_events(
+                        connection, events, clicks, user_ids, page_ids, results
+                    )
+
+                    updated_sessions = await EventBatchService._update_sessions(
+                        connection, website_id, events, updates, results, end=False
+                    )
+                    ended_sessions = await EventBatchService._update_sessions(
+                        connection, website_id, events, ends, results, end=True
+                    )
+
+            page_resolver.remember_all(website_id, page_ids)
+            logger.info(f"Ingested batch of {len(events)} events for website_id={website_id}")
+
+        except Exception as e:
+            logger.error(f"Error ingesting event batch: {e}")
+            return None
+
+        # Only committed events are remembered, so a failed batch can be retried as is
+        for event, result in zip(events, results):
+            if result and result.get("success"):
+                event_dedup.remember(str(event.get("sessionId")), event.get("eventId"))
+
+        await EventBatchService._report_live(website_id, events, results)
+
+        # Score sessions whose duration points changed and ended sessions once the
+        # batch is committed, as SessionService does
+        for session_id in updated_sessions:
+            scoring_worker.submit(session_id)
+        for session_id in ended_sessions:
+            if scoring_worker.submit(session_id, ended=True):
+                continue
+            scoring_success = await LeadScoringService.process_session_end_scoring(session_id)
+            if not scoring_success:
+                logger.warning(f"Lead scoring failed for session: {session_id}")
+
+        return results
+
+    @staticmethod
+    async def _report_live(website_id: int, events: List[Dict[str, Any]], results: List[Dict[str, Any]]):
+        """Feed the committed events to the live score tracker, in input order"""
+        for event, result in zip(events, results):
+            if not result or not result.get("success") or result.get("duplicate"):
+                continue
+            session_id = event["sessionId"]
+            if result["type"] == "page_view":
+                await live_scores.page_viewed(website_id, session_id, event["url"])
+            elif result["type"] == "click":
+                await live_scores.clicked(website_id, session_id, event["elementSelector"], event.get("elementText"))
+            elif result.get("action") == "start":
+                await live_scores.session_started(website_id, session_id, event.get("userId"))
+            elif result.get("action") == "update":
+                await live_scores.duration_reported(session_id, float(event.get("sessionDuration") or 0))
+            elif result.get("action") == "end":
+                await live_scores.session_ended(session_id, float(event.get("sessionDuration") or 0))
+
+    @staticmethod
+    def _error(index: int, event: Dict[str, Any], message: str) -> Dict[str, Any]:
+        return {"index": index, "type": event.get("type"), "success": False, "error": message}
+
+    @staticmethod
+    def _duplicate(index: int, event: Dict[str, Any]) -> Dict[str, Any]:
+        return {"index": index, "type": event.get("type"), "success": True, "duplicate": True}
+
+    @staticmethod
+    async def _drop_stored(connection, table: str, events, indexes, results) -> List[int]:
+        """Drop events whose (session, eventId) is already stored in the table; record them as duplicates."""
+        keyed = [i for i in indexes if events[i].get("eventId")]
+        if not keyed:
+            return indexes
+
+        rows = await connection.fetch(
+            f"""
+            SELECT t.session_id, t.event_id
+            FROM unnest($1::uuid[], $2::text[]) AS t(session_id, event_id)
+            WHERE EXISTS (
+                SELECT 1 FROM {table} e
+                WHERE e.session_id = t.session_id AND e.event_id = t.event_id
+            )
+            """,
+            [events[i]["sessionId"] for i in keyed],
+            [events[i]["eventId"] for i in keyed]
+        )
+        stored = {(str(row["session_id"]), row["event_id"]) for row in rows}
+
+        remaining = []
+        for index in indexes:
+            event = events[index]
+            if (str(event["sessionId"]), event.get("eventId")) in stored:
+                results[index] = EventBatchService._duplicate(index, event)
+            else:
+                remaining.append(index)
+        return remaining
+
+    @staticmethod
+    def _match_inserted(rows, id_column: str, events, indexes) -> Dict[int, int]:
+        """
+        Map inserted rows back to their event indexes. Rows with an event id are
+        matched by key; serial ids are assigned in ORDER BY order, so the sorted
+        ids of the other rows line up with the input. Events missing from the
+        result lost an ON CONFLICT race to a concurrent insert.
+        """
+        by_key = {}
+        anonymous = []
+        for row in rows:
+            if row["event_id"] is None:
+                anonymous.append(row[id_column])
+            else:
+                by_key[(str(row["session_id"]), row["event_id"])] = row[id_column]
+
+        matched = dict(zip([i for i in indexes if not events[i].get("eventId")], sorted(anonymous)))
+        for index in indexes:
+            event_id = events[index].get("eventId")
+            key = (str(events[index]["sessionId"]), event_id)
+            if event_id and key in by_key:
+                matched[index] = by_key[key]
+        return matched
+
+    @staticmethod
+    async def _resolve_sessions(connection, session_ids) -> set:
+        """Return the subset of session ids that exist, so one bad event cannot abort the batch."""
+        if not session_ids:
+            return set()
+
+        rows = await connection.fetch(
+            "SELECT session_id FROM sessions WHERE session_id = ANY($1::uuid[])",
+            list(session_ids)
+        )
+        return {str(row["session_id"]) for row in rows}
+
+    @staticmethod
+    def _filter_resolvable(events, indexes, user_ids, known_sessions, results) -> List[int]:
+        """Keep events whose visitor and session exist; record errors for the rest."""
+        resolvable = []
+        for index in indexes:
+            event = events[index]
+            if str(event.get("userId")) not in user_ids:
+                results[index] = EventBatchService._error(index, event, "User not found")
+            elif str(event["sessionId"]) not in known_sessions:
+                results[index] = EventBatchService._error(index, event, "Session not found")
+            else:
+                resolvable.append(index)
+        return resolvable
+
+    @staticmethod
+    async def _start_sessions(connection, website_id, events, indexes, user_ids, ip_address, results):
+        if not indexes:
+            return
+
+        rows = await connection.fetch(
+            """
+            INSERT INTO sessions (session_id, website_id, user_id, browser, os, user_agent, ip_address, start_time)
+            SELECT t.session_id, $1, t.user_id, t.browser, t.os, t.user_agent, $7::inet, NOW()
+            FROM unnest($2::uuid[], $3::uuid[], $4::text[], $5::text[], $6::text[])
+                 AS t(session_id, user_id, browser, os, user_agent)
+            ON CONFLICT (session_id) DO NOTHING
+            RETURNING session_id
+            """,
+            website_id,
+            [events[i]["sessionId"] for i in indexes],
+            [user_ids.get(str(events[i].get("userId"))) for i in indexes],
+            [events[i].get("browser") or "Unknown" for i in indexes],
+            [events[i].get("os") or "Unknown" for i in indexes],
+            [events[i].get("userAgent") for i in indexes],
+            ip_address
+        )
+
+        started = {str(row["session_id"]) for row in rows}
+        for index in indexes:
+            event = events[index]
+            if str(event["sessionId"]) in started:
+                results[index] = {
+                    "index": index,
+                    "type": "session",
+                    "success": True,
+                    "action": "start",
+                    "session_id": str(event["sessionId"])
+                }
+            else:
+                results[index] = EventBatchService._error(index, event, "Failed to start session")
+
+    @staticmethod
+    async def _insert_page_views(connection, events, indexes, user_ids, page_ids, results):
+        if not indexes:
+            return
+
+        session_ids = [events[i]["sessionId"] for i in indexes]
+
+        # Close the previous open view of every session that gets a new one
+        await connection.execute(
+            """
+            UPDATE page_views
+            SET view_end = NOW()
+            WHERE session_id = ANY($1::uuid[])
+            AND view_end IS NULL
+            """,
+            list(set(session_ids))
+        )
+
+        # Within the batch, every view but the last of its session is closed right away
+        last_view = {str(session_id): index for session_id, index in zip(session_ids, indexes)}
+        closed = [last_view[str(events[i]["sessionId"])] != i for i in indexes]
+
+        rows = await connection.fetch(
+            """
+            INSERT INTO page_views (session_id, user_id, page_id, referrer, view_end, event_id)
+            SELECT t.session_id, t.user_id, t.page_id, t.referrer,
+                   CASE WHEN t.closed THEN NOW() END, t.event_id
+            FROM unnest($1::uuid[], $2::uuid[], $3::int[], $4::text[], $5::bool[], $6::text[])
+                 WITH ORDINALITY AS t(session_id, user_id, page_id, referrer, closed, event_id, ord)
+            ORDER BY t.ord
+            ON CONFLICT (session_id, event_id) DO NOTHING
+            RETURNING view_id, session_id, event_id
+            """,
+            session_ids,
+            [user_ids[str(events[i]["userId"])] for i in indexes],
+            [page_ids[events[i]["url"]] for i in indexes],
+            [events[i].get("referrer") for i in indexes],
+            closed,
+            [events[i].get("eventId") for i in indexes]
+        )
+
+        view_ids = EventBatchService._match_inserted(rows, "view_id", events, indexes)
+        for index in indexes:
+            if index not in view_ids:
+                results[index] = EventBatchService._duplicate(index, events[index])
+                continue
+            view_id = view_ids[index]
+            results[index] = {
+                "index": index,
+                "type": "page_view",
+                "success": True,
+                "view_id": view_id,
+                "page_id": page_ids[events[index]["url"]]
+            }
+
+    @staticmethod
+    async def _insert_click_events(connection, events, indexes, user_ids, page_ids, results):
+        if not indexes:
+            return
+
+        rows = await connection.fetch(
+            """
+            INSERT INTO click_events (session_id, user_id, page_id, element_selector, element_text, x_coord, y_coord, event_id)
+            SELECT t.session_id, t.user_id, t.page_id, t.element_selector, t.element_text, t.x_coord, t.y_coord, t.event_id
+            FROM unnest($1::uuid[], $2::uuid[], $3::int[], $4::text[], $5::text[], $6::int[], $7::int[], $8::text[])
+                 WITH ORDINALITY AS t(session_id, user_id, page_id, element_selector, element_text, x_coord, y_coord, event_id, ord)
+            ORDER BY t.ord
+            ON CONFLICT (session_id, event_id) DO NOTHING
+            RETURNING click_id, session_id, event_id
+            """,
+            [events[i]["sessionId"] for i in indexes],
+            [user_ids[str(events[i]["userId"])] for i in indexes],
+            [page_ids[events[i]["url"]] for i in indexes],
+            [events[i]["elementSelector"] for i in indexes],
+            [events[i].get("elementText") for i in indexes],
+            [events[i].get("xCoord") for i in indexes],
+            [events[i].get("yCoord") for i in indexes],
+            [events[i].get("eventId") for i in indexes]
+        )
+
+        click_ids = EventBatchService._match_inserted(rows, "click_id", events, indexes)
+        for index in indexes:
+            if index not in click_ids:
+                results[index] = EventBatchService._duplicate(index, events[index])
+                continue
+            click_id = click_ids[index]
+            results[index] = {
+                "index": index,
+                "type": "click",
+                "success": True,
+                "click_id": click_id,
+                "page_id": page_ids[events[index]["url"]]
+            }
+
+    @staticmethod
+    async def _update_sessions(connection, website_id: int, events, indexes: Dict[str, int], results, end: bool) -> List[UUID]:
+        """
+        Apply session 'update' or 'end' events. Only the last event per session
+        is applied; earlier duplicates report the same outcome. Returns the
+        sessions to rescore: all ended sessions, or the updated sessions whose
+        duration moved into a band worth different points.
+        """
+        if not indexes:
+            return []
+
+        session_ids = list(indexes.keys())
+        durations = [float(events[i].get("sessionDuration") or 0) for i in indexes.values()]
+
+        if end:
+            await connection.execute(
+                """
+                UPDATE page_views
+                SET view_end = NOW()
+                WHERE session_id = ANY($1::uuid[])
+                AND view_end IS NULL
+                """,
+                session_ids
+            )
+            query = """
+                UPDATE sessions s
+                SET end_time = NOW(),
+                    session_duration = make_interval(secs => t.duration)
+                FROM unnest($1::uuid[], $2::float8[]) AS t(session_id, duration)
+                WHERE s.session_id = t.session_id
+                RETURNING s.session_id
+            """
+        else:
+            query = """
+                UPDATE sessions s
+                SET session_duration = make_interval(secs => t.duration),
+                    last_activity = NOW()
+                FROM unnest($1::uuid[], $2::float8[]) AS t(session_id, duration)
+                JOIN sessions o ON o.session_id = t.session_id
+                WHERE s.session_id = t.session_id
+                RETURNING s.session_id, t.duration,
+                          EXTRACT(EPOCH FROM o.session_duration)::float8 as previous_duration
+            """
+
+        rows = await connection.fetch(query, session_ids, durations)
+        updated = {str(row["session_id"]) for row in rows}
+        action = "end" if end else "update"
+
+        for index, event in enumerate(events):
+            if event.get("type") != "session" or event.get("action") != action:
+                continue
+            if results[index] and results[index].get("duplicate"):
+                continue
+            session_id = str(event["sessionId"])
+            if session_id in updated:
+                results[index] = {
+                    "index": index,
+                    "type": "session",
+                    "success": True,
+                    "action": action,
+                    "session_id": session_id
+                }
+            else:
+                results[index] = EventBatchService._error(index, event, "Session not found")
+
+        if end:
+            return [row["session_id"] for row in rows]
+
+        rules = await scoring_rules.get(website_id, connection)
+        return [
+            row["session_id"] for row in rows
+            if rules.duration_score_changed(row["previous_duration"], row["duration"])
+        ]
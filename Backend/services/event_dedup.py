@@ -0,0 +1,93 @@
+import os
+import math
+import time
+import hashlib
+import logging
+from typing import Optional, List
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Kirsch-Mitzenmacher double hashing over one 128-bit digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key: str):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class EventDeduplicator:
+    """
+    Time-bounded set of recently ingested client event ids.
+
+    Two Bloom filter generations rotate every EVENT_DEDUP_WINDOW seconds (or
+    when the current one reaches EVENT_DEDUP_CAPACITY events), so an event id
+    is remembered for at least one window with bounded memory. Keys are scoped
+    to the session, like the unique constraints in schema.txt that catch
+    whatever the filter misses (older retries, other processes, restarts).
+
+    A false positive drops a new event as a duplicate; EVENT_DEDUP_ERROR_RATE
+    bounds how often that happens.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("EVENT_DEDUP_ENABLED", "true").lower() == "true"
+        self.window = float(os.getenv("EVENT_DEDUP_WINDOW", "600"))
+        self.capacity = int(os.getenv("EVENT_DEDUP_CAPACITY", "500000"))
+        self.error_rate = float(os.getenv("EVENT_DEDUP_ERROR_RATE", "0.000001"))
+
+        self.generations: List[BloomFilter] = [self._new_filter()]
+        self.rotated_at = time.monotonic()
+
+    def _new_filter(self) -> BloomFilter:
+        return BloomFilter(self.capacity, self.error_rate)
+
+    def _rotate_if_due(self):
+        current = self.generations[0]
+        if time.monotonic() - self.rotated_at >= self.window or current.count >= self.capacity:
+            self.generations = [self._new_filter(), current]
+            self.rotated_at = time.monotonic()
+
+    @staticmethod
+    def _key(session_id, event_id: str) -> str:
+        return f"{session_id}:{event_id}"
+
+    def seen(self, session_id, event_id: Optional[str]) -> bool:
+        """Whether an event was (very probably) ingested within the window"""
+        if not self.enabled or not event_id:
+            return False
+        self._rotate_if_due()
+        key = self._key(session_id, event_id)
+        return any(key in generation for generation in self.generations)
+
+    def remember(self, session_id, event_id: Optional[str]):
+        """Record an event id once its event has been written"""
+        if not self.enabled or not event_id:
+            return
+        self._rotate_if_due()
+        self.generations[0].add(self._key(session_id, event_id))
+
+
+# Global event deduplicator instance
+event_dedup = EventDeduplicator()
@@ -0,0 +1,121 @@
+import numpy as np
+from typing import Dict, Any, List, Optional
+
+REFERRER_CLASSES = ["direct", "search", "social", "internal", "other"]
+
+# Columns of the feature matrix, in order. has_click separates "no click" from
+# a click in the first second, since seconds_to_first_click is NULL without clicks.
+FEATURE_NAMES = [
+    "duration_seconds",
+    "page_views",
+    "distinct_pages",
+    "regular_clicks",
+    "important_clicks",
+    "has_click",
+    "seconds_to_first_click",
+] + [f"referrer_{name}" for name in REFERRER_CLASSES]
+
+
+def build_feature_matrix(rows: List[Any]) -> np.ndarray:
+    """
+    Turn session_features records into a float matrix with FEATURE_NAMES columns.
+    """
+    count = len(rows)
+    matrix = np.zeros((count, len(FEATURE_NAMES)), dtype=np.float64)
+    if count == 0:
+        return matrix
+
+    for column, name in enumerate(FEATURE_NAMES[:5]):
+        matrix[:, column] = np.fromiter((row[name] for row in rows), dtype=np.float64, count=count)
+
+    first_click = np.fromiter(
+        (np.nan if row["seconds_to_first_click"] is None else row["seconds_to_first_click"] for row in rows),
+        dtype=np.float64, count=count
+    )
+    has_click = ~np.isnan(first_click)
+    matrix[:, 5] = has_click
+    matrix[:, 6] = np.where(has_click, first_click, 0.0)
+
+    referrers = np.array([row["referrer_class"] for row in rows])
+    for offset, name in enumerate(REFERRER_CLASSES):
+        matrix[:, 7 + offset] = referrers == name
+
+    return matrix
+
+
+class FeatureModel:
+    """
+    Linear or logistic model over session feature vectors.
+
+    A linear model scores bias + features . weights, clipped to 0-100. A
+    logistic model scores 100 * sigmoid(bias + features . weights), i.e. the
+    predicted conversion probability as a percentage. Features without a
+    weight contribute nothing.
+    """
+
+    KINDS = ("linear", "logistic")
+
+    def __init__(self, weights: Dict[str, float], bias: float = 0.0, kind: str = "linear"):
+        unknown = set(weights) - set(FEATURE_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown features: {', '.join(sorted(unknown))}")
+        if kind not in self.KINDS:
+            raise ValueError(f"Model kind must be one of: {', '.join(self.KINDS)}")
+
+        self.kind = kind
+        self.bias = float(bias)
+        self.weights = np.array([float(weights.get(name, 0.0)) for name in FEATURE_NAMES])
+
+    def score(self, matrix: np.ndarray) -> np.ndarray:
+        """Scores (0-100) of every row of a feature matrix in one pass"""
+        z = matrix @ self.weights + self.bias
+        if self.kind == "logistic":
+            return 100.0 / (1.0 + np.exp(-z))
+        return np.clip(z, 0.0, 100.0)
+
+
+def evaluate_model(model: FeatureModel, rows: List[Any], top: int = 20) -> Dict[str, Any]:
+    """
+    Score a site's feature rows with a model, next to the formula scores stored with them.
+
+    Returns:
+        Summary of the model score distribution, its correlation with the
+        formula score and the top sessions by model score
+    """
+    matrix = build_feature_matrix(rows)
+    scores = model.score(matrix)
+    summary: Dict[str, Any] = {"sessions": len(rows)}
+    if len(rows) == 0:
+        return {**summary, "distribution": None, "formula_correlation": None, "top_sessions": []}
+
+    formula = np.fromiter(
+        (np.nan if row["lead_score"] is None else row["lead_score"] for row in rows),
+        dtype=np.float64, count=len(rows)
+    )
+    known = ~np.isnan(formula)
+    correlation: Optional[float] = None
+    if known.sum() > 1 and np.std(scores[known]) > 0 and np.std(formula[known]) > 0:
+        correlation = round(float(np.corrcoef(scores[known], formula[known])[0, 1]), 4)
+
+    percentiles = np.percentile(scores, [50, 90, 99])
+    best = np.argsort(-scores)[:top]
+
+    return {
+        **summary,
+        "distribution": {
+            "mean": round(float(scores.mean()), 2),
+            "p50": round(float(percentiles[0]), 2),
+            "p90": round(float(percentiles[1]), 2),
+            "p99": round(float(percentiles[2]), 2),
+            "max": round(float(scores.max()), 2)
+        },
+        "formula_correlation": correlation,
+        "top_sessions": [
+            {
+                "session_id": str(rows[i]["session_id"]),
+                "model_score": round(float(scores[i]), 2),
+                "formula_score": rows[i]["lead_score"]
+            }
+            for i in best
+        ]
+    }
@@ -0,0 +1,117 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple, Iterable
+from uuid import UUID
+from dotenv import load_dotenv
+from config.database import db_manager
+from config.statements import statements
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IdentityKey = Tuple[int, str]
+
+USER_ID_SQL = statements.register(
+    "SELECT user_id FROM users WHERE website_id = $1 AND visitor_uuid = $2"
+)
+
+
+class IdentityCache:
+    """
+    Bounded, TTL'd cache of (website_id, visitor_uuid) -> user_id.
+
+    Filled by UserService.create_user and by lookups on the ingest path, so
+    repeat events from the same visitor skip the users lookup entirely.
+    Unknown visitors are never cached, since the tracker may create the user
+    right after its first failed event.
+    """
+
+    def __init__(self):
+        self.max_size = int(os.getenv("IDENTITY_CACHE_SIZE", "100000"))
+        self.ttl = float(os.getenv("IDENTITY_CACHE_TTL", "3600"))
+        self.entries: "OrderedDict[IdentityKey, Tuple[UUID, float]]" = OrderedDict()
+
+    def get_cached(self, website_id: int, visitor_uuid: str) -> Optional[UUID]:
+        """Return the cached user_id for a visitor, if present and not expired"""
+        key = (website_id, str(visitor_uuid))
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        user_id, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return user_id
+
+    def remember(self, website_id: int, visitor_uuid: str, user_id: UUID):
+        """Cache a visitor's user_id, evicting the least recently used entry when full"""
+        key = (website_id, str(visitor_uuid))
+        self.entries[key] = (user_id, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, website_id: int, visitor_uuid: str):
+        """Drop a visitor from the cache (e.g. after the user row was removed or changed)"""
+        self.entries.pop((website_id, str(visitor_uuid)), None)
+
+    async def get_user_id(self, website_id: int, visitor_uuid: str, connection=None) -> Optional[UUID]:
+        """
+        Resolve a visitor to the database user_id, querying only on a cache miss.
+
+        Args:
+            website_id: Website the visitor belongs to
+            visitor_uuid: Visitor id from the tracker cookie
+            connection: Optional connection to run the lookup on
+        """
+        user_id = self.get_cached(website_id, visitor_uuid)
+        if user_id is not None:
+            return user_id
+
+        if connection is not None:
+            user_id = await statements.fetchval(connection, USER_ID_SQL, website_id, str(visitor_uuid))
+        else:
+            pool = await db_manager.get_connection()
+            async with pool.acquire() as connection:
+                user_id = await statements.fetchval(connection, USER_ID_SQL, website_id, str(visitor_uuid))
+
+        if user_id is not None:
+            self.remember(website_id, visitor_uuid, user_id)
+        return user_id
+
+    async def get_user_ids(self, connection, website_id: int, visitor_uuids: Iterable[str]) -> Dict[str, UUID]:
+        """Resolve many visitors at once, querying the cache misses in one statement"""
+        user_ids: Dict[str, UUID] = {}
+        missing = []
+        for visitor_uuid in {str(v) for v in visitor_uuids}:
+            user_id = self.get_cached(website_id, visitor_uuid)
+            if user_id is not None:
+                user_ids[visitor_uuid] = user_id
+            else:
+                missing.append(visitor_uuid)
+
+        if missing:
+            rows = await connection.fetch(
+                """
+                SELECT visitor_uuid, user_id
+                FROM users
+                WHERE website_id = $1 AND visitor_uuid = ANY($2::text[])
+                """,
+                website_id, missing
+            )
+            for row in rows:
+                user_ids[row["visitor_uuid"]] = row["user_id"]
+                self.remember(website_id, row["visitor_uuid"], row["user_id"])
+
+        return user_ids
+
+
+# Global visitor identity cache instance
+identity_cache = IdentityCache()
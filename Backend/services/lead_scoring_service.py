@@ -1,82 +1,196 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List
 from uuid import UUID
 from config.database import db_manager
+from config.statements import statements
+from services.scoring_rules import scoring_rules, CompiledRuleSet, DEFAULT_RULE_SET
+from services.session_feature_service import SessionFeatureService
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Page view and click counters are kept up to date by triggers (see schema.txt),
+# so all scoring inputs come from the session row itself
+SESSION_DATA_SQL = statements.register("""
+    SELECT session_id, user_id, website_id,
+           EXTRACT(EPOCH FROM session_duration)::int as duration_seconds,
+           page_view_count, page_points, regular_click_count, important_click_count
+    FROM sessions 
+    WHERE session_id = $1
+""")
+
+SESSIONS_DATA_SQL = statements.register("""
+    SELECT session_id, user_id, website_id,
+           EXTRACT(EPOCH FROM session_duration)::int as duration_seconds,
+           page_view_count, page_points, regular_click_count, important_click_count
+    FROM sessions 
+    WHERE session_id = ANY($1::uuid[])
+""")
+
+UPDATE_SESSION_SCORE_SQL = statements.register("""
+    UPDATE sessions 
+    SET lead_score = $1 
+    WHERE session_id = $2
+""")
+
+# users.lead_score is the running average kept by a trigger on sessions (see schema.txt)
+USER_AVERAGE_SCORE_SQL = statements.register("""
+    SELECT lead_score as avg_score, session_count
+    FROM users 
+    WHERE user_id = $1
+""")
+
+USERS_AVERAGE_SCORE_SQL = statements.register("""
+    SELECT user_id, lead_score as avg_score, session_count
+    FROM users 
+    WHERE user_id = ANY($1::uuid[])
+""")
+
+SITE_FEATURES_SQL = """
+    SELECT session_id, user_id,
+           COALESCE(EXTRACT(EPOCH FROM session_duration)::int, 0) as duration_seconds,
+           page_points, regular_click_count, important_click_count
+    FROM sessions
+    WHERE website_id = $1
+"""
+
+# Recompute a site's counters from its raw events with the site's current rules
+RECOUNT_SITE_SQL = """
+    WITH r AS (
+        SELECT * FROM scoring_rules WHERE website_id = $1
+    ),
+    v AS (
+        SELECT pv.session_id, COUNT(*) as views, COALESCE(SUM(page_view_points(r, p.url)), 0) as points
+        FROM page_views pv
+        JOIN sessions s ON s.session_id = pv.session_id
+        LEFT JOIN pages p ON p.page_id = pv.page_id
+        LEFT JOIN r ON TRUE
+        WHERE s.website_id = $1
+        GROUP BY pv.session_id
+    ),
+    c AS (
+        SELECT ce.session_id,
+               COUNT(*) - COUNT(*) FILTER (WHERE is_important_click(r, ce.element_selector, ce.element_text)) as regular,
+               COUNT(*) FILTER (WHERE is_important_click(r, ce.element_selector, ce.element_text)) as important
+        FROM click_events ce
+        JOIN sessions s ON s.session_id = ce.session_id
+        LEFT JOIN r ON TRUE
+        WHERE s.website_id = $1
+        GROUP BY ce.session_id
+    )
+    UPDATE sessions s
+    SET page_view_count = COALESCE(v.views, 0),
+        page_points = COALESCE(v.points, 0),
+        regular_click_count = COALESCE(c.regular, 0),
+        important_click_count = COALESCE(c.important, 0)
+    FROM sessions t
+    LEFT JOIN v ON v.session_id = t.session_id
+    LEFT JOIN c ON c.session_id = t.session_id
+    WHERE t.website_id = $1
+    AND s.session_id = t.session_id
+    AND (s.page_view_count, s.page_points, s.regular_click_count, s.important_click_count)
+        IS DISTINCT FROM (COALESCE(v.views, 0), COALESCE(v.points, 0)::int, COALESCE(c.regular, 0), COALESCE(c.important, 0))
+"""
+
+BULK_UPDATE_SESSION_SCORES_SQL = """
+    UPDATE sessions s
+    SET lead_score = t.lead_score
+    FROM unnest($1::uuid[], $2::int[]) AS t(session_id, lead_score)
+    WHERE s.session_id = t.session_id
+    AND s.lead_score IS DISTINCT FROM t.lead_score
+"""
+
+RESYNC_USER_SCORE_SQL = """
+    UPDATE users u
+    SET lead_score_sum = a.score_sum,
+        session_count = a.sessions,
+        lead_score = CASE WHEN a.sessions > 0 THEN ROUND(a.score_sum::numeric / a.sessions)::int ELSE 0 END
+    FROM (
+        SELECT COALESCE(SUM(lead_score), 0) as score_sum, COUNT(*) as sessions
+        FROM sessions
+        WHERE user_id = $1
+    ) a
+    WHERE u.user_id = $1
+    RETURNING u.lead_score
+"""
+
+
+# Keyset pages of a site's lead ranking, served by idx_users_site_lead_score.
+# The first page and the pages after a cursor are separate statements, so the
+# (lead_score, user_id) row comparison is always an index condition, also once
+# Postgres switches the prepared statement to a generic plan. $5/$6 is the
+# (lead_score, user_id) of the last row of the previous page.
+TOP_LEADS_TEMPLATE = """
+    SELECT user_id, visitor_uuid, lead_score, session_count, first_seen, last_seen
+    FROM users
+    WHERE website_id = $1
+    AND lead_score >= $2
+    AND ($3::int IS NULL OR last_seen >= NOW() - make_interval(hours => $3::int)){after}
+    ORDER BY lead_score DESC, user_id DESC
+    LIMIT $4
+"""
+
+TOP_LEADS_SQL = statements.register(TOP_LEADS_TEMPLATE.format(after=""))
+
+TOP_LEADS_AFTER_SQL = statements.register(TOP_LEADS_TEMPLATE.format(
+    after="\n    AND (lead_score, user_id) < ($5::int, $6::uuid)"
+))
+
 
 class LeadScoringService:
     """
     Service for calculating and managing lead scores for sessions and users.
     
-    Scoring Formula (Total: 100 points):
-    - Session Duration: 40 points max
-    - Page Views: 30 points max  
-    - Click Events: 30 points max
+    Scoring Formula (Total: 100 points), with the weights, bands, patterns and
+    caps taken from the site's rule set (see services/scoring_rules.py):
+    - Session Duration: 40 points max by default
+    - Page Views: 30 points max by default
+    - Click Events: 30 points max by default
     """
     
-    # Scoring constants
-    MAX_SESSION_SCORE = 40
-    MAX_PAGE_SCORE = 30
-    MAX_CLICK_SCORE = 30
-    POINTS_PER_PAGE = 5
-    POINTS_PER_REGULAR_CLICK = 2
-    POINTS_PER_IMPORTANT_CLICK = 5
-    
-    # Important click text values (case-insensitive)
-    IMPORTANT_CLICK_TEXTS = {"be an early bird", "get a demo"}
-    
     @staticmethod
-    def calculate_session_duration_score(duration_seconds: int) -> int:
+    def calculate_session_duration_score(duration_seconds: int, rules: Optional[CompiledRuleSet] = None) -> int:
         """
         Calculate session duration score based on time spent.
         
         Args:
             duration_seconds: Session duration in seconds
+            rules: Site rule set (defaults to the default rules)
             
         Returns:
-            Score out of 40 points
-        """
-        if duration_seconds < 60:  # < 1 min
-            return 5
-        elif duration_seconds < 180:  # 1-3 min
-            return 15
-        elif duration_seconds < 300:  # 3-5 min
-            return 25
-        elif duration_seconds < 600:  # 5-10 min
-            return 35
-        else:  # 10+ min
-            return 40
+            Score out of the rule set's duration cap
+        """
+        return (rules or DEFAULT_RULE_SET).duration_score(duration_seconds)
     
     @staticmethod
-    def calculate_page_views_score(page_count: int) -> int:
+    def calculate_page_views_score(page_points: int, rules: Optional[CompiledRuleSet] = None) -> int:
         """
         Calculate page views score.
         
         Args:
-            page_count: Number of pages viewed
+            page_points: Sum of the per-page weights of the pages viewed
+            rules: Site rule set (defaults to the default rules)
             
         Returns:
-            Score out of 30 points
+            Score out of the rule set's page cap
         """
-        return min(page_count * LeadScoringService.POINTS_PER_PAGE, LeadScoringService.MAX_PAGE_SCORE)
+        return (rules or DEFAULT_RULE_SET).page_score(page_points)
     
     @staticmethod
-    def calculate_click_events_score(regular_clicks: int, important_clicks: int) -> int:
+    def calculate_click_events_score(regular_clicks: int, important_clicks: int,
+                                     rules: Optional[CompiledRuleSet] = None) -> int:
         """
         Calculate click events score.
         
         Args:
             regular_clicks: Number of regular clicks
             important_clicks: Number of important clicks (high-value elements)
+            rules: Site rule set (defaults to the default rules)
             
         Returns:
-            Score out of 30 points
+            Score out of the rule set's click cap
         """
-        total_points = (regular_clicks * LeadScoringService.POINTS_PER_REGULAR_CLICK + 
-                       important_clicks * LeadScoringService.POINTS_PER_IMPORTANT_CLICK)
-        return min(total_points, LeadScoringService.MAX_CLICK_SCORE)
+        return (rules or DEFAULT_RULE_SET).click_score(regular_clicks, important_clicks)
     
     @staticmethod
     async def get_session_analytics_data(session_id: UUID) -> Optional[Dict[str, Any]]:
@@ -93,58 +207,102 @@ class LeadScoringService:
             pool = await db_manager.get_connection()
             async with pool.acquire() as connection:
                 # Get session data with duration
-                session_data = await connection.fetchrow(
-                    """
-                    SELECT session_id, user_id, 
-                           EXTRACT(EPOCH FROM session_duration)::int as duration_seconds
-                    FROM sessions 
-                    WHERE session_id = $1
-                    """,
-                    session_id
-                )
+                session_data = await statements.fetchrow(connection, SESSION_DATA_SQL, session_id)
                 
                 if not session_data:
                     logger.warning(f"Session not found: {session_id}")
                     return None
                 
-                # Get page views count
-                page_views_count = await connection.fetchval(
-                    """
-                    SELECT COUNT(*) 
-                    FROM page_views 
-                    WHERE session_id = $1
-                    """,
-                    session_id
-                )
-                
-                # Get click events data
-                click_data = await connection.fetchrow(
-                    """
-                    SELECT 
-                        COUNT(*) as total_clicks,
-                        COUNT(CASE WHEN LOWER(element_text) IN ('be an early bird', 'get a demo') 
-                              THEN 1 END) as important_clicks
-                    FROM click_events 
-                    WHERE session_id = $1
-                    """,
-                    session_id
-                )
-                
-                regular_clicks = click_data['total_clicks'] - click_data['important_clicks']
-                
-                return {
-                    'session_id': session_id,
-                    'user_id': session_data['user_id'],
-                    'duration_seconds': session_data['duration_seconds'] or 0,
-                    'page_views_count': page_views_count or 0,
-                    'regular_clicks': regular_clicks,
-                    'important_clicks': click_data['important_clicks']
-                }
+                return LeadScoringService._analytics_from_row(session_data)
                 
         except Exception as e:
             logger.error(f"Error getting session analytics data: {e}")
             return None
     
+    @staticmethod
+    def _analytics_from_row(row) -> Dict[str, Any]:
+        return {
+            'session_id': row['session_id'],
+            'user_id': row['user_id'],
+            'website_id': row['website_id'],
+            'duration_seconds': row['duration_seconds'] or 0,
+            'page_views_count': row['page_view_count'],
+            'page_points': row['page_points'],
+            'regular_clicks': row['regular_click_count'],
+            'important_clicks': row['important_click_count']
+        }
+    
+    @staticmethod
+    def build_score_breakdown(analytics_data: Dict[str, Any], rules: CompiledRuleSet) -> Dict[str, Any]:
+        """
+        Score a session's analytics data and describe each component of the score.
+        
+        Args:
+            analytics_data: Dictionary from get_session_analytics_data
+            rules: Rule set of the session's site
+            
+        Returns:
+            Dictionary with the lead score, the analytics and the score breakdown
+        """
+        duration_score = LeadScoringService.calculate_session_duration_score(
+            analytics_data['duration_seconds'], rules
+        )
+        page_score = LeadScoringService.calculate_page_views_score(
+            analytics_data['page_points'], rules
+        )
+        click_score = LeadScoringService.calculate_click_events_score(
+            analytics_data['regular_clicks'],
+            analytics_data['important_clicks'],
+            rules
+        )
+        total_score = duration_score + page_score + click_score
+        
+        return {
+            "lead_score": total_score,
+            "analytics": {
+                "duration_seconds": analytics_data['duration_seconds'],
+                "page_views_count": analytics_data['page_views_count'],
+                "page_points": analytics_data['page_points'],
+                "regular_clicks": analytics_data['regular_clicks'],
+                "important_clicks": analytics_data['important_clicks']
+            },
+            "score_breakdown": {
+                "duration_score": f"{duration_score}/{rules.duration_cap}",
+                "page_score": f"{page_score}/{rules.page_cap}",
+                "click_score": f"{click_score}/{rules.click_cap}",
+                "total_score": f"{total_score}/100"
+            },
+            "rules_version": rules.version
+        }
+    
+    @staticmethod
+    async def calculate_session_lead_scores(session_ids: List[UUID]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Calculate the lead scores of many sessions with one query.
+        
+        Args:
+            session_ids: Session UUIDs
+            
+        Returns:
+            Score breakdown per found session id, or None if the query failed
+        """
+        try:
+            pool = await db_manager.get_connection("dashboard")
+            async with pool.acquire() as connection:
+                rows = await statements.fetch(connection, SESSIONS_DATA_SQL, list(set(session_ids)))
+            
+            scores = {}
+            for row in rows:
+                rules = await scoring_rules.get(row['website_id'])
+                scores[str(row['session_id'])] = LeadScoringService.build_score_breakdown(
+                    LeadScoringService._analytics_from_row(row), rules
+                )
+            return scores
+            
+        except Exception as e:
+            logger.error(f"Error calculating session lead scores: {e}")
+            return None
+    
     @staticmethod
     async def calculate_session_lead_score(session_id: UUID) -> Optional[int]:
         """
@@ -162,16 +320,12 @@ class LeadScoringService:
             if not analytics_data:
                 return None
             
-            # Calculate individual scores
-            duration_score = LeadScoringService.calculate_session_duration_score(
-                analytics_data['duration_seconds']
-            )
-            
-            page_score = LeadScoringService.calculate_page_views_score(
-                analytics_data['page_views_count']
-            )
+            rules = await scoring_rules.get(analytics_data['website_id'])
             
-            click_score = LeadScoringService.calculate_click_events_score(
+            # Calculate individual scores
+            duration_score = rules.duration_score(analytics_data['duration_seconds'])
+            page_score = rules.page_score(analytics_data['page_points'])
+            click_score = rules.click_score(
                 analytics_data['regular_clicks'],
                 analytics_data['important_clicks']
             )
@@ -180,10 +334,10 @@ class LeadScoringService:
             total_score = duration_score + page_score + click_score
             
             logger.info(
-                f"Session {session_id} lead score breakdown: "
-                f"Duration: {duration_score}/{LeadScoringService.MAX_SESSION_SCORE}, "
-                f"Pages: {page_score}/{LeadScoringService.MAX_PAGE_SCORE}, "
-                f"Clicks: {click_score}/{LeadScoringService.MAX_CLICK_SCORE}, "
+                f"Session {session_id} lead score breakdown (rules v{rules.version}): "
+                f"Duration: {duration_score}/{rules.duration_cap}, "
+                f"Pages: {page_score}/{rules.page_cap}, "
+                f"Clicks: {click_score}/{rules.click_cap}, "
                 f"Total: {total_score}/100"
             )
             
@@ -213,13 +367,8 @@ class LeadScoringService:
             # Update session with lead score
             pool = await db_manager.get_connection()
             async with pool.acquire() as connection:
-                result = await connection.execute(
-                    """
-                    UPDATE sessions 
-                    SET lead_score = $1 
-                    WHERE session_id = $2
-                    """,
-                    lead_score, session_id
+                result = await statements.execute(
+                    connection, UPDATE_SESSION_SCORE_SQL, lead_score, session_id
                 )
                 
                 if result == "UPDATE 1":
@@ -237,6 +386,8 @@ class LeadScoringService:
     async def calculate_user_average_lead_score(user_id: UUID) -> Optional[float]:
         """
         Calculate the average lead score for a user across all their sessions.
+        Reads the running average maintained on the user row, so the cost does
+        not depend on the number of sessions.
         
         Args:
             user_id: User UUID
@@ -247,14 +398,7 @@ class LeadScoringService:
         try:
             pool = await db_manager.get_connection()
             async with pool.acquire() as connection:
-                result = await connection.fetchrow(
-                    """
-                    SELECT AVG(lead_score)::int as avg_score, COUNT(*) as session_count
-                    FROM sessions 
-                    WHERE user_id = $1 AND lead_score IS NOT NULL
-                    """,
-                    user_id
-                )
+                result = await statements.fetchrow(connection, USER_AVERAGE_SCORE_SQL, user_id)
                 
                 if result and result['session_count'] > 0:
                     avg_score = result['avg_score'] or 0
@@ -267,10 +411,88 @@ class LeadScoringService:
             logger.error(f"Error calculating user average lead score: {e}")
             return None
     
+    @staticmethod
+    async def score_sessions(session_ids: List[UUID], workload: str = "ingest") -> Optional[int]:
+        """
+        Calculate and store the lead scores of many sessions at once.
+        Features are read with one query, scored per site with the compiled
+        rules and written with one UPDATE; user averages follow by trigger.
+        
+        Args:
+            session_ids: Session UUIDs
+            workload: Connection pool to run on
+            
+        Returns:
+            Number of sessions scored or None on error
+        """
+        try:
+            pool = await db_manager.get_connection(workload)
+            async with pool.acquire() as connection:
+                rows = await statements.fetch(connection, SESSIONS_DATA_SQL, list(set(session_ids)))
+                
+                by_site: Dict[int, list] = {}
+                for row in rows:
+                    by_site.setdefault(row['website_id'], []).append(row)
+                
+                scored_ids, scores = [], []
+                for website_id, site_rows in by_site.items():
+                    rules = await scoring_rules.get(website_id, connection)
+                    scored_ids += [row['session_id'] for row in site_rows]
+                    scores += rules.score_many(
+                        [row['duration_seconds'] for row in site_rows],
+                        [row['page_points'] for row in site_rows],
+                        [row['regular_click_count'] for row in site_rows],
+                        [row['important_click_count'] for row in site_rows]
+                    )
+                
+                if scored_ids:
+                    await connection.execute(BULK_UPDATE_SESSION_SCORES_SQL, scored_ids, scores)
+                    try:
+                        await SessionFeatureService.record_session_features(scored_ids, connection)
+                    except Exception as e:
+                        logger.warning(f"Failed to record features for {len(scored_ids)} sessions: {e}")
+            
+            logger.info(f"✅ Scored {len(scored_ids)} sessions in bulk")
+            return len(scored_ids)
+            
+        except Exception as e:
+            logger.error(f"Error scoring sessions in bulk: {e}")
+            return None
+    
+    @staticmethod
+    async def calculate_user_average_lead_scores(user_ids: List[UUID]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Get the average lead scores of many users with one query.
+        
+        Args:
+            user_ids: User UUIDs
+            
+        Returns:
+            Average score and session count per found user id, or None if the query failed
+        """
+        try:
+            pool = await db_manager.get_connection("dashboard")
+            async with pool.acquire() as connection:
+                rows = await statements.fetch(connection, USERS_AVERAGE_SCORE_SQL, list(set(user_ids)))
+            
+            return {
+                str(row['user_id']): {
+                    "average_lead_score": row['avg_score'] if row['session_count'] > 0 else 0,
+                    "session_count": row['session_count']
+                }
+                for row in rows
+            }
+            
+        except Exception as e:
+            logger.error(f"Error calculating user average lead scores: {e}")
+            return None
+    
     @staticmethod
     async def update_user_lead_score(user_id: UUID) -> bool:
         """
-        Calculate and update the average lead score for a user.
+        Recompute a user's running score sum and session count from their sessions.
+        The trigger on sessions keeps these in sync on every score change; this
+        is only needed to repair a user whose aggregate has drifted.
         
         Args:
             user_id: User UUID
@@ -279,25 +501,12 @@ class LeadScoringService:
             True if successful, False otherwise
         """
         try:
-            # Calculate average lead score
-            avg_score = await LeadScoringService.calculate_user_average_lead_score(user_id)
-            if avg_score is None:
-                return False
-            
-            # Update user with average lead score
             pool = await db_manager.get_connection()
             async with pool.acquire() as connection:
-                result = await connection.execute(
-                    """
-                    UPDATE users 
-                    SET lead_score = $1 
-                    WHERE user_id = $2
-                    """,
-                    int(avg_score), user_id
-                )
+                avg_score = await connection.fetchval(RESYNC_USER_SCORE_SQL, user_id)
                 
-                if result == "UPDATE 1":
-                    logger.info(f"✅ Updated user {user_id} lead score to {int(avg_score)}")
+                if avg_score is not None:
+                    logger.info(f"✅ Updated user {user_id} lead score to {avg_score}")
                     return True
                 else:
                     logger.warning(f"❌ Failed to update user {user_id} lead score")
@@ -308,48 +517,188 @@ class LeadScoringService:
             return False
     
     @staticmethod
-    async def process_session_end_scoring(session_id: UUID) -> bool:
+    async def process_session_end_scoring(session_id: UUID, record_features: bool = True) -> bool:
         """
         Complete lead scoring process when a session ends.
-        Updates both session and user lead scores.
+        Updates the session lead score; the user's average follows by delta
+        through the trigger on sessions. The session's feature vector is then
+        stored for model-based scoring.
         
         Args:
             session_id: Session UUID
+            record_features: Store the feature vector; False when rescoring a
+                session that is still in progress
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            # Get session data to find user_id
-            pool = await db_manager.get_connection()
-            async with pool.acquire() as connection:
-                session_data = await connection.fetchrow(
-                    "SELECT user_id FROM sessions WHERE session_id = $1",
-                    session_id
-                )
-                
-                if not session_data or not session_data['user_id']:
-                    logger.warning(f"Session {session_id} has no associated user")
-                    # Still update session score even without user
-                    return await LeadScoringService.update_session_lead_score(session_id)
-                
-                user_id = session_data['user_id']
-            
-            # Update session lead score
             session_updated = await LeadScoringService.update_session_lead_score(session_id)
             if not session_updated:
                 logger.error(f"Failed to update session lead score for {session_id}")
                 return False
             
-            # Update user average lead score
-            user_updated = await LeadScoringService.update_user_lead_score(user_id)
-            if not user_updated:
-                logger.error(f"Failed to update user lead score for {user_id}")
-                return False
+            # The feature store is best effort and must not fail the scoring itself
+            if record_features:
+                try:
+                    await SessionFeatureService.record_session_features([session_id])
+                except Exception as e:
+                    logger.warning(f"Failed to record features for session {session_id}: {e}")
             
-            logger.info(f"✅ Completed lead scoring for session {session_id} and user {user_id}")
+            logger.info(f"✅ Completed lead scoring for session {session_id}")
             return True
             
         except Exception as e:
             logger.error(f"Error processing session end scoring: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    @staticmethod
+    async def get_top_leads(
+        website_id: int,
+        limit: int = 20,
+        min_score: int = 0,
+        window_hours: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get a page of a site's highest-scoring users.
+        
+        Pages are read from the (website_id, lead_score, user_id) index with a
+        keyset cursor, so every page costs the same regardless of how many
+        users the site has.
+        
+        Args:
+            website_id: Website to rank
+            limit: Page size
+            min_score: Only users with at least this lead score
+            window_hours: Only users seen within this many hours
+            cursor: next_cursor of the previous page
+            
+        Returns:
+            Dictionary with the leads and the cursor of the next page, or None on error
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        after = ()
+        if cursor:
+            score_part, _, user_part = cursor.partition("_")
+            after = (int(score_part), UUID(user_part))
+        
+        try:
+            pool = await db_manager.get_connection("dashboard")
+            async with pool.acquire() as connection:
+                rows = await statements.fetch(
+                    connection, TOP_LEADS_AFTER_SQL if after else TOP_LEADS_SQL,
+                    website_id, min_score, window_hours, limit, *after
+                )
+            
+            leads = [
+                {
+                    "user_id": str(row["user_id"]),
+                    "visitor_uuid": row["visitor_uuid"],
+                    "lead_score": row["lead_score"],
+                    "session_count": row["session_count"],
+                    "first_seen": row["first_seen"].isoformat() if row["first_seen"] else None,
+                    "last_seen": row["last_seen"].isoformat() if row["last_seen"] else None
+                }
+                for row in rows
+            ]
+            
+            next_cursor = None
+            if len(rows) == limit:
+                next_cursor = f"{rows[-1]['lead_score']}_{rows[-1]['user_id']}"
+            
+            return {"leads": leads, "next_cursor": next_cursor}
+            
+        except Exception as e:
+            logger.error(f"Error getting top leads: {e}")
+            return None
+    
+    @staticmethod
+    async def rescore_site(
+        website_id: int,
+        chunk_size: int = 1000,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+        recount: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Recalculate the lead score of every session and user of a site.
+        
+        Features for all sessions are read from their counters in one pass, scored
+        with the site's compiled rule set, and written back in chunks
+        with UPDATE ... FROM unnest(...). Only rows whose score changed are
+        rewritten; user averages follow by delta through the sessions trigger.
+        
+        Args:
+            website_id: Website to rescore
+            chunk_size: Number of rows written per UPDATE statement
+            progress: Optional callback called as progress(stage, done, total)
+            recount: Recompute the session counters from raw events first, which is
+                needed after the site's click patterns or page weights changed
+            
+        Returns:
+            Summary dictionary or None if rescoring failed
+        """
+        try:
+            started = time.perf_counter()
+            
+            pool = await db_manager.get_connection("adhoc")
+            async with pool.acquire() as connection:
+                sessions_recounted = 0
+                if recount:
+                    result = await connection.execute(RECOUNT_SITE_SQL, website_id)
+                    sessions_recounted = int(result.split()[-1])
+                
+                rules = await scoring_rules.get(website_id, connection)
+                rows = await connection.fetch(SITE_FEATURES_SQL, website_id)
+                
+                session_ids = [row['session_id'] for row in rows]
+                session_scores = rules.score_many(
+                    [row['duration_seconds'] for row in rows],
+                    [row['page_points'] for row in rows],
+                    [row['regular_click_count'] for row in rows],
+                    [row['important_click_count'] for row in rows]
+                )
+                user_ids = {row['user_id'] for row in rows if row['user_id']}
+                
+                sessions_changed = await LeadScoringService._bulk_write(
+                    connection, BULK_UPDATE_SESSION_SCORES_SQL, session_ids, session_scores,
+                    chunk_size, "sessions", progress
+                )
+            
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"✅ Rescored website {website_id}: {len(session_ids)} sessions ({sessions_changed} changed), "
+                f"{len(user_ids)} users in {elapsed:.2f}s"
+            )
+            
+            return {
+                "sessions_scored": len(session_ids),
+                "sessions_changed": sessions_changed,
+                "sessions_recounted": sessions_recounted,
+                "rules_version": rules.version,
+                "users_scored": len(user_ids),
+                "elapsed_seconds": round(elapsed, 3)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error rescoring website {website_id}: {e}")
+            return None
+    
+    @staticmethod
+    async def _bulk_write(connection, sql: str, ids: list, scores: list, chunk_size: int, stage: str, progress) -> int:
+        """
+        Write (id, score) pairs in chunks of one UPDATE each. No transaction is
+        opened, so every chunk commits on its own and row locks are held for
+        one chunk only. Returns rows changed.
+        """
+        changed = 0
+        for start in range(0, len(ids), chunk_size):
+            result = await connection.execute(
+                sql, ids[start:start + chunk_size], scores[start:start + chunk_size]
+            )
+            changed += int(result.split()[-1])
+            if progress:
+                progress(stage, min(start + chunk_size, len(ids)), len(ids))
+        return changed
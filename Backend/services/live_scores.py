@@ -0,0 +1,235 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Set, List
+from dotenv import load_dotenv
+from services.lead_scoring_service import LeadScoringService
+from services.scoring_rules import scoring_rules
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSession:
+    """In-memory scoring state of one in-progress session"""
+
+    __slots__ = ("website_id", "visitor_uuid", "first_seen", "last_event", "reported_duration",
+                 "page_points", "regular_clicks", "important_clicks", "current_url", "score")
+
+    def __init__(self, website_id: int, visitor_uuid: Optional[str] = None):
+        now = time.monotonic()
+        self.website_id = website_id
+        self.visitor_uuid = visitor_uuid
+        self.first_seen = now
+        self.last_event = now
+        self.reported_duration = 0
+        self.page_points = 0
+        self.regular_clicks = 0
+        self.important_clicks = 0
+        self.current_url: Optional[str] = None
+        self.score: Optional[int] = None
+
+    def duration_seconds(self) -> int:
+        """Duration reported by the tracker, or time since first seen if that is longer"""
+        return max(int(self.reported_duration), int(time.monotonic() - self.first_seen))
+
+
+class LiveScoreTracker:
+    """
+    Live lead scores of in-progress sessions, pushed to per-site subscribers.
+
+    The ingest services report each committed event here. Scores are computed
+    with the same per-site formulas as LeadScoringService over counters kept in
+    memory, so no database query is needed per event. A periodic tick lets the
+    duration component grow while a visitor reads a page, and drops sessions
+    that have been idle for longer than LIVE_SESSION_IDLE_TIMEOUT.
+
+    State is per process: sessions that started before a restart, or whose
+    events were handled by another worker, begin counting from their next event.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("LIVE_SCORES_ENABLED", "true").lower() == "true"
+        self.idle_timeout = float(os.getenv("LIVE_SESSION_IDLE_TIMEOUT", "1800"))
+        self.max_sessions = int(os.getenv("LIVE_MAX_SESSIONS", "100000"))
+        self.tick_interval = float(os.getenv("LIVE_SCORES_TICK", "15"))
+        self.queue_size = int(os.getenv("LIVE_SUBSCRIBER_QUEUE", "256"))
+
+        self.sessions: "OrderedDict[str, LiveSession]" = OrderedDict()
+        self.subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the periodic duration / expiry tick"""
+        if not self.enabled:
+            print("ℹ️ Live lead scores disabled")
+            return
+        self.task = asyncio.create_task(self._run())
+        print("✅ Live lead scores started")
+
+    async def stop(self):
+        """Stop the tick and drop all live state"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        self.sessions.clear()
+        print("🔌 Live lead scores stopped")
+
+    def subscribe(self, website_id: int) -> asyncio.Queue:
+        """Register a subscriber for a site's score changes"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.setdefault(website_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, website_id: int, queue: asyncio.Queue):
+        queues = self.subscribers.get(website_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[website_id]
+
+    def snapshot(self, website_id: int) -> List[Dict[str, Any]]:
+        """Current live scores of a site's active sessions, highest first"""
+        entries = [
+            self._event(session_id, state, None)
+            for session_id, state in self.sessions.items()
+            if state.website_id == website_id and state.score is not None
+        ]
+        return sorted(entries, key=lambda entry: entry["lead_score"], reverse=True)
+
+    async def session_started(self, website_id: int, session_id, visitor_uuid: Optional[str] = None):
+        if not self.enabled:
+            return
+        state = self._touch(website_id, session_id)
+        if visitor_uuid:
+            state.visitor_uuid = str(visitor_uuid)
+        await self._rescore(str(session_id), state)
+
+    async def page_viewed(self, website_id: int, session_id, url: str):
+        if not self.enabled:
+            return
+        try:
+            rules = await scoring_rules.get(website_id)
+            state = self._touch(website_id, session_id)
+            state.page_points += rules.page_view_points(url)
+            state.current_url = url
+            await self._rescore(str(session_id), state)
+        except Exception as e:
+            logger.error(f"Error updating live score for page view: {e}")
+
+    async def clicked(self, website_id: int, session_id, element_selector: str, element_text: Optional[str] = None):
+        if not self.enabled:
+            return
+        try:
+            rules = await scoring_rules.get(website_id)
+            state = self._touch(website_id, session_id)
+            if rules.is_important_click(element_selector, element_text):
+                state.important_clicks += 1
+            else:
+                state.regular_clicks += 1
+            await self._rescore(str(session_id), state)
+        except Exception as e:
+            logger.error(f"Error updating live score for click: {e}")
+
+    async def duration_reported(self, session_id, duration_seconds: float):
+        state = self.sessions.get(str(session_id))
+        if state is None:
+            return
+        state.reported_duration = max(state.reported_duration, duration_seconds or 0)
+        state.last_event = time.monotonic()
+        self.sessions.move_to_end(str(session_id))
+        await self._rescore(str(session_id), state)
+
+    async def session_ended(self, session_id, duration_seconds: Optional[float] = None):
+        """Publish the final live score of a session and forget it"""
+        state = self.sessions.pop(str(session_id), None)
+        if state is None:
+            return
+        if duration_seconds:
+            state.reported_duration = max(state.reported_duration, duration_seconds)
+        await self._rescore(str(session_id), state, ended=True)
+
+    def _touch(self, website_id: int, session_id) -> LiveSession:
+        key = str(session_id)
+        state = self.sessions.get(key)
+        if state is None:
+            state = LiveSession(website_id)
+            self.sessions[key] = state
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        else:
+            self.sessions.move_to_end(key)
+        state.last_event = time.monotonic()
+        return state
+
+    async def _rescore(self, session_id: str, state: LiveSession, ended: bool = False):
+        """Recompute a session's score and publish it if it changed"""
+        try:
+            rules = await scoring_rules.get(state.website_id)
+            score = (
+                LeadScoringService.calculate_session_duration_score(state.duration_seconds(), rules)
+                + LeadScoringService.calculate_page_views_score(state.page_points, rules)
+                + LeadScoringService.calculate_click_events_score(
+                    state.regular_clicks, state.important_clicks, rules
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error computing live score for session {session_id}: {e}")
+            return
+
+        previous = state.score
+        state.score = score
+        if score != previous or ended:
+            self._publish(state.website_id, self._event(session_id, state, previous, ended))
+
+    def _publish(self, website_id: int, event: Dict[str, Any]):
+        for queue in self.subscribers.get(website_id, ()):
+            if queue.full():
+                # Slow subscriber: drop its oldest update rather than block ingestion
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    @staticmethod
+    def _event(session_id: str, state: LiveSession, previous: Optional[int], ended: bool = False) -> Dict[str, Any]:
+        return {
+            "session_id": session_id,
+            "visitor_uuid": state.visitor_uuid,
+            "lead_score": state.score,
+            "previous_score": previous,
+            "duration_seconds": state.duration_seconds(),
+            "page_points": state.page_points,
+            "regular_clicks": state.regular_clicks,
+            "important_clicks": state.important_clicks,
+            "current_url": state.current_url,
+            "ended": ended
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            try:
+                await self._tick()
+            except Exception as e:
+                logger.error(f"Error in live score tick: {e}")
+
+    async def _tick(self):
+        now = time.monotonic()
+        expired = [key for key, state in self.sessions.items() if now - state.last_event > self.idle_timeout]
+        for key in expired:
+            del self.sessions[key]
+
+        # Duration keeps growing without events; only worth recomputing for watched sites
+        for key, state in list(self.sessions.items()):
+            if state.website_id in self.subscribers:
+                await self._rescore(key, state)
+
+
+# Global live lead score tracker instance
+live_scores = LiveScoreTracker()
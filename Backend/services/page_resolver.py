@@ -0,0 +1,140 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple, Iterable
+from dotenv import load_dotenv
+from config.database import db_manager
+from config.statements import statements
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PageKey = Tuple[int, str]
+
+UPSERT_PAGE_SQL = statements.register("""
+    INSERT INTO pages (website_id, url, title)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (website_id, url) DO UPDATE SET title = COALESCE(pages.title, EXCLUDED.title)
+    RETURNING page_id
+""")
+
+
+class PageResolver:
+    """
+    Resolves (website_id, url) to page_id for page views and click events.
+
+    Hot URLs are served from a bounded LRU cache. Concurrent misses for the
+    same URL share a single lookup, and a miss is resolved with one upsert
+    statement, so first hits on a new URL can no longer race into unique
+    violations on UNIQUE(website_id, url).
+    """
+
+    def __init__(self):
+        self.max_size = int(os.getenv("PAGE_CACHE_SIZE", "10000"))
+        self.page_ids: "OrderedDict[PageKey, int]" = OrderedDict()
+        self.inflight: Dict[PageKey, asyncio.Future] = {}
+
+    def get_cached(self, website_id: int, url: str) -> Optional[int]:
+        """Return the cached page_id for a URL, if any"""
+        key = (website_id, url)
+        page_id = self.page_ids.get(key)
+        if page_id is not None:
+            self.page_ids.move_to_end(key)
+        return page_id
+
+    def remember(self, website_id: int, url: str, page_id: int):
+        """Cache a resolved page_id, evicting the least recently used entry when full"""
+        key = (website_id, url)
+        self.page_ids[key] = page_id
+        self.page_ids.move_to_end(key)
+        while len(self.page_ids) > self.max_size:
+            self.page_ids.popitem(last=False)
+
+    def remember_all(self, website_id: int, page_ids: Dict[str, int]):
+        """Cache every url -> page_id pair of a committed batch"""
+        for url, page_id in page_ids.items():
+            self.remember(website_id, url, page_id)
+
+    async def get_page_id(self, website_id: int, url: str, title: Optional[str] = None, connection=None) -> Optional[int]:
+        """
+        Get existing page or create new one. Returns page_id or None on failure.
+
+        Args:
+            website_id: Website the page belongs to
+            url: Page URL
+            title: Title stored when the page is created (or still has none)
+            connection: Optional connection to run the upsert on
+        """
+        page_id = self.get_cached(website_id, url)
+        if page_id is not None:
+            return page_id
+
+        key = (website_id, url)
+        inflight = self.inflight.get(key)
+        if inflight:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            if connection is not None:
+                page_id = await self._upsert(connection, website_id, url, title)
+            else:
+                pool = await db_manager.get_connection()
+                async with pool.acquire() as connection:
+                    page_id = await self._upsert(connection, website_id, url, title)
+
+            self.remember(website_id, url, page_id)
+
+        except Exception as e:
+            logger.error(f"Error creating/getting page: {e}")
+            page_id = None
+
+        finally:
+            future.set_result(page_id)
+            self.inflight.pop(key, None)
+
+        return page_id
+
+    async def get_page_ids(self, connection, website_id: int, pages: Iterable[Tuple[str, Optional[str]]]) -> Dict[str, int]:
+        """
+        Resolve many (url, title) pairs at once. Cache misses are upserted
+        with a single multi-row statement on the given connection.
+
+        Newly resolved ids are not cached here, since the caller's transaction
+        may still roll back; call remember_all() once it has committed.
+        """
+        page_ids: Dict[str, int] = {}
+        missing: Dict[str, Optional[str]] = {}
+        for url, title in pages:
+            page_id = self.get_cached(website_id, url)
+            if page_id is not None:
+                page_ids[url] = page_id
+            elif missing.get(url) is None:
+                missing[url] = title
+
+        if missing:
+            rows = await connection.fetch(
+                """
+                INSERT INTO pages (website_id, url, title)
+                SELECT $1, t.url, t.title
+                FROM unnest($2::text[], $3::text[]) AS t(url, title)
+                ON CONFLICT (website_id, url) DO UPDATE SET title = COALESCE(pages.title, EXCLUDED.title)
+                RETURNING page_id, url
+                """,
+                website_id, list(missing.keys()), list(missing.values())
+            )
+            for row in rows:
+                page_ids[row["url"]] = row["page_id"]
+
+        return page_ids
+
+    async def _upsert(self, connection, website_id: int, url: str, title: Optional[str]) -> int:
+        return await statements.fetchval(connection, UPSERT_PAGE_SQL, website_id, url, title)
+
+
+# Global page resolver instance
+page_resolver = PageResolver()
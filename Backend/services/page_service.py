@@ -1,105 +1,116 @@
-from typing import Optional
+from typing import Optional, Dict, Any
 from uuid import UUID
 from config.database import db_manager
+from config.statements import statements
+from services.site_registry import site_registry
+from services.identity_cache import identity_cache
+from services.page_resolver import page_resolver
+from services.live_scores import live_scores
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Resolves user and page (unless cached), closes the previous open view and
+# inserts the new one. $7 / $8 carry the cached page_id / user_id or NULL.
+# A retried delivery of an already stored client event id ($9) leaves the
+# open view alone and inserts nothing.
+TRACK_PAGE_VIEW_SQL = statements.register("""
+    WITH usr AS (
+        SELECT $8::uuid AS user_id WHERE $8::uuid IS NOT NULL
+        UNION ALL
+        SELECT user_id FROM users
+        WHERE $8::uuid IS NULL AND website_id = $1 AND visitor_uuid = $5
+    ),
+    new_page AS (
+        INSERT INTO pages (website_id, url, title)
+        SELECT $1, $2, $3 WHERE $7::int IS NULL
+        ON CONFLICT (website_id, url) DO UPDATE SET title = COALESCE(pages.title, EXCLUDED.title)
+        RETURNING page_id
+    ),
+    page AS (
+        SELECT $7::int AS page_id WHERE $7::int IS NOT NULL
+        UNION ALL
+        SELECT page_id FROM new_page
+    ),
+    closed AS (
+        UPDATE page_views 
+        SET view_end = NOW() 
+        WHERE session_id = $4 
+        AND view_end IS NULL
+        AND EXISTS (SELECT 1 FROM usr)
+        AND NOT EXISTS (SELECT 1 FROM page_views WHERE session_id = $4 AND event_id = $9)
+    )
+    INSERT INTO page_views (session_id, user_id, page_id, referrer, event_id)
+    SELECT $4, usr.user_id, page.page_id, $6, $9
+    FROM usr, page
+    ON CONFLICT (session_id, event_id) DO NOTHING
+    RETURNING view_id, page_id, user_id
+""")
+
+EXISTING_PAGE_VIEW_SQL = statements.register("""
+    SELECT view_id, page_id FROM page_views WHERE session_id = $1 AND event_id = $2
+""")
+
 
 class PageService:
     @staticmethod
     async def get_or_create_page(website_id: int, url: str, title: Optional[str] = None) -> Optional[int]:
         """
         Get existing page or create new one. Returns page_id.
+        Shared by page views and click events through the page resolver.
         """
-        try:
-            pool = await db_manager.get_connection()
-            async with pool.acquire() as connection:
-                # Try to get existing page
-                result = await connection.fetchrow(
-                    "SELECT page_id FROM pages WHERE website_id = $1 AND url = $2",
-                    website_id, url
-                )
-
-                if result:
-                    return result["page_id"]
-
-                # Create new page
-                result = await connection.fetchrow(
-                    """
-                    INSERT INTO pages (website_id, url, title) 
-                    VALUES ($1, $2, $3) 
-                    RETURNING page_id
-                    """,
-                    website_id, url, title
-                )
-                
-                if result:
-                    page_id = result["page_id"]
-                    logger.info(f"Created new page: {page_id} for URL: {url}")
-                    return page_id
-
-                return None
-
-        except Exception as e:
-            logger.error(f"Error creating/getting page: {e}")
-            return None
+        return await page_resolver.get_page_id(website_id, url, title)
 
     @staticmethod
-    async def create_page_view(session_id: UUID, visitor_uuid: UUID, page_id: int, site_id: str, referrer: Optional[str] = None) -> Optional[int]:
+    async def track_page_view(
+        website_id: int,
+        session_id: UUID,
+        visitor_uuid: UUID,
+        url: str,
+        title: Optional[str] = None,
+        referrer: Optional[str] = None,
+        event_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         """
-        Create a new page view record. Also updates the previous page view's end time.
+        Record a page view with one connection checkout and one statement.
+
+        The statement resolves the user (unless cached), gets or creates the
+        page (unless cached), closes the session's previous open view and
+        inserts the new view atomically. Returns view_id and page_id, or None
+        if the visitor is unknown or the insert failed. If event_id was already
+        stored for the session, the original view is returned with duplicate set.
         """
         try:
+            cached_page_id = page_resolver.get_cached(website_id, url)
+            cached_user_id = identity_cache.get_cached(website_id, visitor_uuid)
+
             pool = await db_manager.get_connection()
             async with pool.acquire() as connection:
-                # Get the database user_id from visitor_uuid
-                user_result = await connection.fetchrow(
-                    """
-                    SELECT u.user_id 
-                    FROM users u
-                    JOIN websites w ON u.website_id = w.website_id
-                    WHERE w.site_id = $1 AND u.visitor_uuid = $2
-                    """,
-                    site_id, str(visitor_uuid)
-                )
-                
-                if not user_result:
-                    logger.error(f"User not found for visitor_uuid: {visitor_uuid} and site_id: {site_id}")
-                    return None
-                
-                db_user_id = user_result["user_id"]
-                
-                # First, update the previous page view's end time for this session
-                await connection.execute(
-                    """
-                    UPDATE page_views 
-                    SET view_end = NOW() 
-                    WHERE session_id = $1 
-                    AND view_end IS NULL
-                    """,
-                    session_id
+                result = await statements.fetchrow(
+                    connection, TRACK_PAGE_VIEW_SQL,
+                    website_id, url, title, session_id, str(visitor_uuid), referrer,
+                    cached_page_id, cached_user_id, event_id
                 )
+                if not result and event_id:
+                    existing = await statements.fetchrow(
+                        connection, EXISTING_PAGE_VIEW_SQL, session_id, event_id
+                    )
+                    if existing:
+                        return {"view_id": existing["view_id"], "page_id": existing["page_id"], "duplicate": True}
+
+            if not result:
+                logger.error(f"User not found for visitor_uuid: {visitor_uuid} and website_id: {website_id}")
+                return None
 
-                # Create new page view
-                result = await connection.fetchrow(
-                    """
-                    INSERT INTO page_views (session_id, user_id, page_id, referrer) 
-                    VALUES ($1, $2, $3, $4) 
-                    RETURNING view_id
-                    """,
-                    session_id, db_user_id, page_id, referrer
-                )
-                
-                if result:
-                    view_id = result["view_id"]
-                    logger.info(f"Created page view: {view_id} for page: {page_id}, user: {db_user_id}")
-                    return view_id
+            page_resolver.remember(website_id, url, result["page_id"])
+            identity_cache.remember(website_id, visitor_uuid, result["user_id"])
+            await live_scores.page_viewed(website_id, session_id, url)
 
-                return None
+            logger.info(f"Created page view: {result['view_id']} for page: {result['page_id']}, user: {result['user_id']}")
+            return {"view_id": result["view_id"], "page_id": result["page_id"]}
 
         except Exception as e:
-            logger.error(f"Error creating page view: {e}")
+            logger.error(f"Error tracking page view: {e}")
             return None
 
     @staticmethod
@@ -133,14 +144,7 @@ class PageService:
         Get website_id from site_id for page creation.
         """
         try:
-            pool = await db_manager.get_connection()
-            async with pool.acquire() as connection:
-                result = await connection.fetchrow(
-                    "SELECT website_id FROM websites WHERE site_id = $1",
-                    site_id
-                )
-
-                return result["website_id"] if result else None
+            return await site_registry.get_website_id(site_id)
 
         except Exception as e:
             logger.error(f"Error getting website_id: {e}")
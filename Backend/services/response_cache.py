@@ -0,0 +1,87 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class SiteResponseCache:
+    """
+    Per-site cache of dashboard responses with stale-while-revalidate.
+
+    A response is fresh for ANALYTICS_CACHE_TTL seconds. For another
+    ANALYTICS_CACHE_STALE seconds the stale response is returned at once while
+    a single background load refreshes it. Concurrent misses on the same key
+    share one load, so any number of dashboard tabs polling a site cause at
+    most one query per key and interval (per process). Failed loads (None) are
+    not cached and leave a stale response in place.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("ANALYTICS_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl = float(os.getenv("ANALYTICS_CACHE_TTL", "10"))
+        self.stale = float(os.getenv("ANALYTICS_CACHE_STALE", "60"))
+        self.max_entries = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "10000"))
+
+        self.entries: Dict[Tuple, Tuple[Any, float]] = {}  # key -> (response, loaded_at)
+        self.loading: Dict[Tuple, asyncio.Task] = {}
+
+    async def get(self, website_id: int, key: Tuple, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Cached response of a site for key, loaded with loader() when missing or expired.
+        """
+        if not self.enabled:
+            return await loader()
+
+        cache_key = (website_id, *key)
+        entry = self.entries.get(cache_key)
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            if age < self.ttl:
+                return entry[0]
+            if age < self.ttl + self.stale:
+                self._load(cache_key, loader)
+                return entry[0]
+
+        return await asyncio.shield(self._load(cache_key, loader))
+
+    def _load(self, cache_key: Tuple, loader) -> asyncio.Task:
+        task = self.loading.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(self._fill(cache_key, loader))
+            self.loading[cache_key] = task
+        return task
+
+    async def _fill(self, cache_key: Tuple, loader) -> Optional[Any]:
+        try:
+            response = await loader()
+            if response is not None:
+                if len(self.entries) >= self.max_entries:
+                    self._evict()
+                self.entries[cache_key] = (response, time.monotonic())
+            return response
+        except Exception as e:
+            logger.error(f"Error loading cached response {cache_key}: {e}")
+            return None
+        finally:
+            self.loading.pop(cache_key, None)
+
+    def _evict(self):
+        """Drop expired responses, or the oldest half if none have expired"""
+        cutoff = time.monotonic() - self.ttl - self.stale
+        expired = [k for k, (_, loaded_at) in self.entries.items() if loaded_at < cutoff]
+        if not expired:
+            by_age = sorted(self.entries, key=lambda k: self.entries[k][1])
+            expired = by_age[:len(by_age) // 2]
+        for cache_key in expired:
+            del self.entries[cache_key]
+
+
+# Global dashboard response cache instance
+analytics_cache = SiteResponseCache()
@@ -0,0 +1,265 @@
+import os
+import re
+import time
+import logging
+from bisect import bisect_right
+import numpy as np
+from typing import Optional, Dict, Any, List, Tuple, Sequence
+from dotenv import load_dotenv
+from config.database import db_manager
+from config.statements import statements
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Default rule set; the column defaults of scoring_rules in schema.txt, and the
+# page_points / important_texts fallbacks of its scoring helpers, must match
+DEFAULT_RULES: Dict[str, Any] = {
+    "duration_bands": [60, 180, 300, 600],
+    "duration_points": [5, 15, 25, 35, 40],
+    "duration_cap": 40,
+    "page_points": 5,
+    "page_patterns": [],
+    "page_pattern_points": [],
+    "page_cap": 30,
+    "click_points": 2,
+    "important_click_points": 5,
+    "important_texts": ["be an early bird", "get a demo"],
+    "important_selectors": [],
+    "click_cap": 30,
+}
+
+RULE_COLUMNS = list(DEFAULT_RULES.keys())
+
+RULES_SQL = statements.register(f"""
+    SELECT {", ".join(RULE_COLUMNS)}, version
+    FROM scoring_rules
+    WHERE website_id = $1
+""")
+
+UPSERT_RULES_SQL = f"""
+    INSERT INTO scoring_rules (website_id, {", ".join(RULE_COLUMNS)})
+    VALUES ($1, {", ".join(f"${i + 2}" for i in range(len(RULE_COLUMNS)))})
+    ON CONFLICT (website_id) DO UPDATE SET
+        {", ".join(f"{column} = EXCLUDED.{column}" for column in RULE_COLUMNS)},
+        version = scoring_rules.version + 1,
+        updated_at = NOW()
+    RETURNING version
+"""
+
+
+def like_to_regex(pattern: str) -> "re.Pattern":
+    """
+    Compile a SQL LIKE pattern (% and _ wildcards, backslash escape) to an
+    equivalent regex. Raises ValueError for a pattern ending in a lone
+    backslash, which Postgres rejects too.
+    """
+    parts = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            parts.append(re.escape(char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    if escaped:
+        raise ValueError(f"LIKE pattern must not end with an escape character: {pattern!r}")
+    return re.compile("".join(parts), re.DOTALL)
+
+
+def validate_rules(rules: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill in defaults for missing keys and check a rule set for consistency.
+    Raises ValueError when the rule set cannot produce a 0-100 score.
+    """
+    merged = {key: default if rules.get(key) is None else rules[key] for key, default in DEFAULT_RULES.items()}
+
+    bands = merged["duration_bands"]
+    if list(bands) != sorted(set(bands)):
+        raise ValueError("duration_bands must be strictly increasing")
+    if len(merged["duration_points"]) != len(bands) + 1:
+        raise ValueError("duration_points must have one more entry than duration_bands")
+    if len(merged["page_patterns"]) != len(merged["page_pattern_points"]):
+        raise ValueError("page_patterns and page_pattern_points must have the same length")
+
+    numbers = [merged[key] for key in ("duration_cap", "page_points", "page_cap", "click_points",
+                                        "important_click_points", "click_cap")]
+    numbers += list(merged["duration_points"]) + list(merged["page_pattern_points"])
+    if any(value < 0 for value in numbers):
+        raise ValueError("points and caps must not be negative")
+    if merged["duration_cap"] + merged["page_cap"] + merged["click_cap"] > 100:
+        raise ValueError("duration_cap + page_cap + click_cap must not exceed 100")
+
+    for pattern in list(merged["page_patterns"]) + list(merged["important_selectors"]):
+        like_to_regex(pattern)
+
+    merged["important_texts"] = [text.lower() for text in merged["important_texts"]]
+    return merged
+
+
+class CompiledRuleSet:
+    """
+    A site's scoring rules compiled once into lookup tables and closures.
+
+    Scores are computed from per-session features: duration in seconds, page
+    points (the sum of per-page weights, maintained by the page view trigger)
+    and regular / important click counts (classified by the click trigger with
+    the same rules). score_many scores whole columns of features with NumPy
+    array operations (searchsorted into the duration bands, minimum for the
+    caps) instead of a Python loop per session.
+    """
+
+    def __init__(self, rules: Dict[str, Any], version: int = 0):
+        self.rules = rules
+        self.version = version
+
+        self.duration_cap = rules["duration_cap"]
+        self.page_cap = rules["page_cap"]
+        self.click_cap = rules["click_cap"]
+
+        bands = tuple(rules["duration_bands"])
+        band_points = tuple(min(points, self.duration_cap) for points in rules["duration_points"])
+        page_cap = self.page_cap
+        click_cap = self.click_cap
+        click_points = rules["click_points"]
+        important_points = rules["important_click_points"]
+
+        def duration_score(duration_seconds: int) -> int:
+            return band_points[bisect_right(bands, duration_seconds or 0)]
+
+        def page_score(page_points: int) -> int:
+            return min(page_points, page_cap)
+
+        def click_score(regular_clicks: int, important_clicks: int) -> int:
+            return min(regular_clicks * click_points + important_clicks * important_points, click_cap)
+
+        band_array = np.array(bands, dtype=np.int64)
+        band_points_array = np.array(band_points, dtype=np.int64)
+
+        def score_many(durations: Sequence[int], page_points: Sequence[int],
+                       regular_clicks: Sequence[int], important_clicks: Sequence[int]) -> List[int]:
+            count = len(durations)
+            d = np.fromiter((value or 0 for value in durations), dtype=np.int64, count=count)
+            p = np.fromiter(page_points, dtype=np.int64, count=count)
+            r = np.fromiter(regular_clicks, dtype=np.int64, count=count)
+            i = np.fromiter(important_clicks, dtype=np.int64, count=count)
+            scores = (
+                band_points_array[np.searchsorted(band_array, d, side="right")]
+                + np.minimum(p, page_cap)
+                + np.minimum(r * click_points + i * important_points, click_cap)
+            )
+            return scores.tolist()
+
+        self.duration_score = duration_score
+        self.page_score = page_score
+        self.click_score = click_score
+        self.score_many = score_many
+
+        self.page_patterns = [
+            (like_to_regex(pattern), points)
+            for pattern, points in zip(rules["page_patterns"], rules["page_pattern_points"])
+        ]
+        self.important_texts = frozenset(rules["important_texts"])
+        self.important_selectors = [like_to_regex(pattern) for pattern in rules["important_selectors"]]
+
+    def score(self, duration_seconds: int, page_points: int, regular_clicks: int, important_clicks: int) -> int:
+        """Total lead score (0-100) of one session"""
+        return (self.duration_score(duration_seconds) + self.page_score(page_points)
+                + self.click_score(regular_clicks, important_clicks))
+
+    def duration_score_changed(self, previous_seconds: Optional[float], duration_seconds: Optional[float]) -> bool:
+        """Whether a new session duration moves the session into a band worth different points"""
+        return self.duration_score(previous_seconds or 0) != self.duration_score(duration_seconds or 0)
+
+    def page_view_points(self, url: str) -> int:
+        """Points for one view of a page; mirrors page_view_points() in schema.txt"""
+        for regex, points in self.page_patterns:
+            if regex.fullmatch(url or ""):
+                return points
+        return self.rules["page_points"]
+
+    def is_important_click(self, selector: Optional[str], text: Optional[str]) -> bool:
+        """Whether a click is high-value; mirrors is_important_click() in schema.txt"""
+        if text is not None and text.lower() in self.important_texts:
+            return True
+        return selector is not None and any(regex.fullmatch(selector) for regex in self.important_selectors)
+
+
+DEFAULT_RULE_SET = CompiledRuleSet(DEFAULT_RULES)
+
+
+class ScoringRuleRegistry:
+    """
+    Cache of compiled rule sets per website.
+
+    A rule set is compiled on first use and kept until it is updated through
+    this registry, or until SCORING_RULES_TTL expires so that changes made by
+    other processes are picked up.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("SCORING_RULES_TTL", "300"))
+        self.entries: Dict[int, Tuple[CompiledRuleSet, float]] = {}
+
+    async def get(self, website_id: Optional[int], connection=None) -> CompiledRuleSet:
+        """Compiled rule set of a site, falling back to the default rules"""
+        if website_id is None:
+            return DEFAULT_RULE_SET
+
+        entry = self.entries.get(website_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        try:
+            if connection is not None:
+                row = await statements.fetchrow(connection, RULES_SQL, website_id)
+            else:
+                pool = await db_manager.get_connection()
+                async with pool.acquire() as connection:
+                    row = await statements.fetchrow(connection, RULES_SQL, website_id)
+        except Exception as e:
+            logger.error(f"Error loading scoring rules for website {website_id}: {e}")
+            return entry[0] if entry is not None else DEFAULT_RULE_SET
+
+        if row is None:
+            rule_set = DEFAULT_RULE_SET
+        elif entry is not None and entry[0].version == row["version"]:
+            rule_set = entry[0]
+        else:
+            rule_set = CompiledRuleSet({column: row[column] for column in RULE_COLUMNS}, row["version"])
+
+        self.entries[website_id] = (rule_set, time.monotonic() + self.ttl)
+        return rule_set
+
+    async def update(self, website_id: int, rules: Dict[str, Any]) -> Optional[CompiledRuleSet]:
+        """
+        Store a new rule set for a site and recompile it.
+        Raises ValueError for an inconsistent rule set; returns None on database errors.
+        """
+        merged = validate_rules(rules)
+        try:
+            pool = await db_manager.get_connection()
+            async with pool.acquire() as connection:
+                version = await connection.fetchval(
+                    UPSERT_RULES_SQL, website_id, *[merged[column] for column in RULE_COLUMNS]
+                )
+        except Exception as e:
+            logger.error(f"Error updating scoring rules for website {website_id}: {e}")
+            return None
+
+        rule_set = CompiledRuleSet(merged, version)
+        self.entries[website_id] = (rule_set, time.monotonic() + self.ttl)
+        logger.info(f"✅ Scoring rules for website {website_id} updated to version {version}")
+        return rule_set
+
+
+# Global scoring rule registry instance
+scoring_rules = ScoringRuleRegistry()
@@ -0,0 +1,160 @@
+import os
+import asyncio
+import logging
+from typing import Optional, Set, List, Dict, Tuple
+from dotenv import load_dotenv
+from services.lead_scoring_service import LeadScoringService
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class LeadScoringWorker:
+    """
+    Background worker that recomputes session and user lead scores.
+
+    Session end and update signals are queued instead of scored inline, so the
+    tracker's request returns as soon as the session row is written. Signals
+    for a session that is already queued are merged into the pending
+    recompute; a signal that arrives while the session is being scored causes
+    exactly one more recompute afterwards. Failed recomputes are requeued
+    after a growing delay, a bounded number of times, without holding up a
+    worker task meanwhile; the queue and pending retries are drained on shutdown. Session
+    features are only stored for sessions submitted as ended, not for the
+    periodic rescoring of sessions still in progress.
+    """
+
+    def __init__(self):
+        self.concurrency = int(os.getenv("SCORING_WORKER_CONCURRENCY", "2"))
+        self.max_attempts = int(os.getenv("SCORING_MAX_ATTEMPTS", "3"))
+        self.retry_delay = float(os.getenv("SCORING_RETRY_DELAY", "2.0"))
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+        self.pending: Set[str] = set()
+        self.running: Set[str] = set()
+        self.rerun: Set[str] = set()
+        self.ended: Set[str] = set()
+        self.retries: Dict[str, Tuple[asyncio.TimerHandle, int]] = {}  # session -> (timer, next attempt)
+        self.closing = False
+
+    async def start(self):
+        """Start the worker tasks"""
+        self.queue = asyncio.Queue()
+        self.closing = False
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        print(f"✅ Lead scoring worker started ({self.concurrency} tasks)")
+
+    async def stop(self):
+        """Stop accepting signals, finish all queued recomputes and stop the workers"""
+        if not self.tasks:
+            return
+
+        self.closing = True
+        pending = len(self.pending) + len(self.retries)
+        # Retries waiting for their delay are run right away; retries of
+        # recomputes that fail while closing are queued without a delay
+        for session_id, (timer, attempt) in list(self.retries.items()):
+            timer.cancel()
+            self._retry(session_id, attempt)
+        await self.queue.join()
+
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+        self.tasks = []
+        self.queue = None
+        print(f"🔌 Lead scoring worker drained ({pending} sessions scored on shutdown)")
+
+    def submit(self, session_id, ended: bool = False) -> bool:
+        """
+        Queue a session for rescoring; ended marks a session that has ended,
+        whose features are then stored too. Returns False if the worker is not
+        accepting work, in which case the caller should score inline.
+        """
+        if self.queue is None or self.closing:
+            return False
+
+        key = str(session_id)
+        if ended:
+            self.ended.add(key)
+        if key in self.pending:
+            return True
+        if key in self.running:
+            self.rerun.add(key)
+            return True
+
+        self._enqueue(key, 1)
+        return True
+
+    def _enqueue(self, session_id: str, attempt: int):
+        retry = self.retries.pop(session_id, None)
+        if retry is not None:
+            # A new signal supersedes the scheduled retry
+            retry[0].cancel()
+        self.pending.add(session_id)
+        self.queue.put_nowait((session_id, attempt))
+
+    def _schedule_retry(self, session_id: str, attempt: int):
+        if self.closing:
+            self._retry(session_id, attempt)
+            return
+        previous = self.retries.get(session_id)
+        if previous is not None:
+            previous[0].cancel()
+        timer = asyncio.get_running_loop().call_later(
+            self.retry_delay * (attempt - 1), self._retry, session_id, attempt
+        )
+        self.retries[session_id] = (timer, attempt)
+
+    def _retry(self, session_id: str, attempt: int):
+        self.retries.pop(session_id, None)
+        if self.queue is None:
+            return
+        if session_id not in self.pending and session_id not in self.running:
+            self._enqueue(session_id, attempt)
+
+    async def _work(self):
+        while True:
+            session_id, attempt = await self.queue.get()
+            try:
+                await self._process(session_id, attempt)
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, session_id: str, attempt: int):
+        self.pending.discard(session_id)
+        self.running.add(session_id)
+        ended = session_id in self.ended
+        self.ended.discard(session_id)
+        try:
+            success = await LeadScoringService.process_session_end_scoring(session_id, record_features=ended)
+        except Exception as e:
+            logger.error(f"Error scoring session {session_id}: {e}")
+            success = False
+        finally:
+            self.running.discard(session_id)
+
+        if ended and not success:
+            # Keep the end signal for the recompute that follows
+            self.ended.add(session_id)
+
+        if session_id in self.rerun:
+            # New activity arrived while scoring; recompute once more with fresh data
+            self.rerun.discard(session_id)
+            if session_id not in self.pending:
+                self._enqueue(session_id, 1)
+        elif not success:
+            if attempt < self.max_attempts:
+                logger.warning(f"Lead scoring failed for session {session_id} (attempt {attempt}), retrying")
+                self._schedule_retry(session_id, attempt + 1)
+            else:
+                logger.error(f"Giving up lead scoring for session {session_id} after {attempt} attempts")
+                self.ended.discard(session_id)
+
+
+# Global lead scoring worker instance
+scoring_worker = LeadScoringWorker()
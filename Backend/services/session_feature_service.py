@@ -0,0 +1,141 @@
+from typing import Optional, List, Any, Callable
+from uuid import UUID
+from config.database import db_manager
+from config.statements import statements
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Counters come from the session row; distinct pages, entry referrer and first
+# click are read through the per-session indexes on page_views / click_events
+UPSERT_FEATURES_SQL = statements.register("""
+    INSERT INTO session_features (
+        session_id, website_id, duration_seconds, page_views, distinct_pages,
+        regular_clicks, important_clicks, referrer_class, seconds_to_first_click,
+        lead_score, computed_at
+    )
+    SELECT s.session_id, s.website_id,
+           COALESCE(EXTRACT(EPOCH FROM s.session_duration)::int, 0),
+           s.page_view_count,
+           (SELECT COUNT(DISTINCT pv.page_id) FROM page_views pv WHERE pv.session_id = s.session_id),
+           s.regular_click_count,
+           s.important_click_count,
+           referrer_class(
+               (SELECT pv.referrer FROM page_views pv
+                WHERE pv.session_id = s.session_id
+                ORDER BY pv.view_start, pv.view_id
+                LIMIT 1),
+               w.url
+           ),
+           (SELECT GREATEST(EXTRACT(EPOCH FROM MIN(ce.click_time) - s.start_time), 0)::int
+            FROM click_events ce WHERE ce.session_id = s.session_id),
+           s.lead_score,
+           NOW()
+    FROM sessions s
+    JOIN websites w ON w.website_id = s.website_id
+    WHERE s.session_id = ANY($1::uuid[])
+    ON CONFLICT (session_id) DO UPDATE SET
+        duration_seconds = EXCLUDED.duration_seconds,
+        page_views = EXCLUDED.page_views,
+        distinct_pages = EXCLUDED.distinct_pages,
+        regular_clicks = EXCLUDED.regular_clicks,
+        important_clicks = EXCLUDED.important_clicks,
+        referrer_class = EXCLUDED.referrer_class,
+        seconds_to_first_click = EXCLUDED.seconds_to_first_click,
+        lead_score = EXCLUDED.lead_score,
+        computed_at = EXCLUDED.computed_at
+""")
+
+SITE_FEATURES_SQL = """
+    SELECT session_id, duration_seconds, page_views, distinct_pages, regular_clicks,
+           important_clicks, referrer_class, seconds_to_first_click, lead_score
+    FROM session_features
+    WHERE website_id = $1
+"""
+
+
+class SessionFeatureService:
+    """
+    Service for the session feature store.
+
+    Features are written once per scored session (and refreshed if the
+    session is scored again), so model experiments read one narrow table
+    instead of re-deriving features from raw events.
+    """
+
+    @staticmethod
+    async def record_session_features(session_ids: List[UUID], connection=None) -> int:
+        """
+        Compute and store the feature vectors of sessions.
+
+        Args:
+            session_ids: Session UUIDs
+            connection: Optional connection to run the statement on
+
+        Returns:
+            Number of feature rows written
+        """
+        if connection is not None:
+            result = await statements.execute(connection, UPSERT_FEATURES_SQL, list(session_ids))
+        else:
+            pool = await db_manager.get_connection()
+            async with pool.acquire() as connection:
+                result = await statements.execute(connection, UPSERT_FEATURES_SQL, list(session_ids))
+        return int(result.split()[-1])
+
+    @staticmethod
+    async def backfill_site(
+        website_id: int,
+        chunk_size: int = 1000,
+        progress: Optional[Callable[[str, int, int], None]] = None
+    ) -> Optional[int]:
+        """
+        Compute features for every session of a site, in chunks.
+
+        Args:
+            website_id: Website to backfill
+            chunk_size: Sessions per statement
+            progress: Optional callback called as progress(stage, done, total)
+
+        Returns:
+            Number of feature rows written or None on error
+        """
+        try:
+            pool = await db_manager.get_connection("adhoc")
+            async with pool.acquire() as connection:
+                rows = await connection.fetch(
+                    "SELECT session_id FROM sessions WHERE website_id = $1", website_id
+                )
+                session_ids = [row["session_id"] for row in rows]
+
+                written = 0
+                for start in range(0, len(session_ids), chunk_size):
+                    written += await SessionFeatureService.record_session_features(
+                        session_ids[start:start + chunk_size], connection
+                    )
+                    if progress:
+                        progress("features", min(start + chunk_size, len(session_ids)), len(session_ids))
+
+            logger.info(f"✅ Backfilled {written} session feature rows for website {website_id}")
+            return written
+
+        except Exception as e:
+            logger.error(f"Error backfilling session features: {e}")
+            return None
+
+    @staticmethod
+    async def get_site_features(website_id: int) -> Optional[List[Any]]:
+        """
+        Get all feature rows of a site.
+
+        Returns:
+            List of records or None on error
+        """
+        try:
+            pool = await db_manager.get_connection("adhoc")
+            async with pool.acquire() as connection:
+                return await connection.fetch(SITE_FEATURES_SQL, website_id)
+
+        except Exception as e:
+            logger.error(f"Error getting session features: {e}")
+            return None
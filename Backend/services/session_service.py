@@ -2,7 +2,45 @@ import asyncpg
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from config.database import db_manager
+from config.statements import statements
+from services.site_registry import site_registry
+from services.identity_cache import identity_cache
 from services.lead_scoring_service import LeadScoringService
+from services.scoring_worker import scoring_worker
+from services.live_scores import live_scores
+from services.scoring_rules import scoring_rules
+
+START_SESSION_SQL = statements.register("""
+    INSERT INTO sessions (session_id, website_id, user_id, browser, os, user_agent, ip_address, start_time)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, NOW())
+    RETURNING session_id, website_id, user_id, browser, os, start_time
+""")
+
+CLOSE_PAGE_VIEWS_SQL = statements.register("""
+    UPDATE page_views 
+    SET view_end = NOW() 
+    WHERE session_id = $1 
+    AND view_end IS NULL
+""")
+
+END_SESSION_SQL = statements.register("""
+    UPDATE sessions 
+    SET end_time = NOW(), 
+        session_duration = make_interval(secs => $1)
+    WHERE session_id = $2
+""")
+
+# Returns the duration before the update (read from the pre-update row o), so
+# heartbeats only trigger a rescore when the duration band changes
+UPDATE_DURATION_SQL = statements.register("""
+    UPDATE sessions s
+    SET session_duration = make_interval(secs => $1),
+        last_activity = NOW()
+    FROM sessions o
+    WHERE s.session_id = $2
+    AND o.session_id = s.session_id
+    RETURNING s.website_id, EXTRACT(EPOCH FROM o.session_duration)::float8 as previous_duration
+""")
 
 class SessionService:
     @staticmethod
@@ -18,57 +56,47 @@ class SessionService:
         """Start a new session"""
         try:
             print(f"🔄 Starting session: site_id={site_id}, session_id={session_id}, user_id={user_id}")
+            # Get website_id from site_id
+            website_id = await site_registry.get_website_id(site_id)
+            
+            if not website_id:
+                print(f"❌ Website not found for site_id: {site_id}")
+                return None
+            
+            print(f"✅ Found website_id: {website_id}")
+            
             pool = await db_manager.get_connection()
             async with pool.acquire() as connection:
-                # Get website_id from site_id
-                website = await connection.fetchrow(
-                    "SELECT website_id FROM websites WHERE site_id = $1",
-                    site_id
-                )
-                
-                if not website:
-                    print(f"❌ Website not found for site_id: {site_id}")
-                    return None
-                
-                website_id = website["website_id"]
-                print(f"✅ Found website_id: {website_id}")
-                
                 # Get user_uuid (database user_id) if user_id (visitor_uuid) is provided
                 db_user_id = None
                 if user_id:
-                    user_result = await connection.fetchrow(
-                        "SELECT user_id FROM users WHERE website_id = $1 AND visitor_uuid = $2",
-                        website_id, user_id
-                    )
-                    if user_result:
-                        db_user_id = user_result['user_id']
+                    db_user_id = await identity_cache.get_user_id(website_id, user_id, connection)
+                    if db_user_id:
                         print(f"✅ Found database user_id: {db_user_id}")
                     else:
                         print(f"⚠️ User not found in database for visitor_uuid: {user_id}, creating session without user link")
                 
                 # Insert new session
-                result = await connection.fetchrow(
-                    """
-                    INSERT INTO sessions (session_id, website_id, user_id, browser, os, user_agent, ip_address, start_time)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, NOW())
-                    RETURNING session_id, website_id, user_id, browser, os, start_time
-                    """,
+                result = await statements.fetchrow(
+                    connection, START_SESSION_SQL,
                     session_id, website_id, db_user_id, browser, os, user_agent, ip_address
                 )
-                
-                if result:
-                    print(f"✅ Session created successfully: {result['session_id']}")
-                    return {
-                        "session_id": str(result["session_id"]),
-                        "website_id": result["website_id"],
-                        "user_id": str(result["user_id"]) if result["user_id"] else None,
-                        "browser": result["browser"],
-                        "os": result["os"],
-                        "start_time": result["start_time"]
-                    }
-                
+            
+            if not result:
                 print("❌ Session creation returned no result")
                 return None
+            
+            print(f"✅ Session created successfully: {result['session_id']}")
+            # After releasing the connection: a rules cache miss checks out one of its own
+            await live_scores.session_started(website_id, result["session_id"], user_id)
+            return {
+                "session_id": str(result["session_id"]),
+                "website_id": result["website_id"],
+                "user_id": str(result["user_id"]) if result["user_id"] else None,
+                "browser": result["browser"],
+                "os": result["os"],
+                "start_time": result["start_time"]
+            }
                 
         except Exception as e:
             print(f"❌ Error starting session: {e}")
@@ -94,25 +122,11 @@ class SessionService:
                 print(f"✅ Session found, updating...")
                 
                 # End any open page views for this session
-                await connection.execute(
-                    """
-                    UPDATE page_views 
-                    SET view_end = NOW() 
-                    WHERE session_id = $1 
-                    AND view_end IS NULL
-                    """,
-                    session_id
-                )
+                await statements.execute(connection, CLOSE_PAGE_VIEWS_SQL, session_id)
                 
                 # Update session with end time and duration
-                result = await connection.execute(
-                    """
-                    UPDATE sessions 
-                    SET end_time = NOW(), 
-                        session_duration = make_interval(secs => $1)
-                    WHERE session_id = $2
-                    """,
-                    session_duration, session_id
+                result = await statements.execute(
+                    connection, END_SESSION_SQL, session_duration, session_id
                 )
                 
                 print(f"✅ Update result: {result}")
@@ -120,16 +134,21 @@ class SessionService:
                 # Check if session was found and updated
                 session_updated = result == "UPDATE 1"
                 
-                if session_updated:
-                    # Calculate and update lead scores for session and user
+            if session_updated:
+                await live_scores.session_ended(session_id, session_duration)
+                
+                # Queue lead scoring for session and user; score inline only if the worker is not running
+                if scoring_worker.submit(session_id, ended=True):
+                    print(f"🔄 Queued lead scoring for session: {session_id}")
+                else:
                     print(f"🔄 Processing lead scoring for session: {session_id}")
                     scoring_success = await LeadScoringService.process_session_end_scoring(session_id)
                     if scoring_success:
                         print(f"✅ Lead scoring completed for session: {session_id}")
                     else:
                         print(f"⚠️ Lead scoring failed for session: {session_id}")
-                
-                return session_updated
+            
+            return session_updated
                 
         except Exception as e:
             print(f"❌ Error ending session: {e}")
@@ -143,16 +162,21 @@ class SessionService:
             pool = await db_manager.get_connection()
             async with pool.acquire() as connection:
                 # Update session duration
-                result = await connection.execute(
-                    """
-                    UPDATE sessions 
-                    SET session_duration = make_interval(secs => $1)
-                    WHERE session_id = $2
-                    """,
-                    session_duration, session_id
+                result = await statements.fetchrow(
+                    connection, UPDATE_DURATION_SQL, session_duration, session_id
                 )
-                
-                return result == "UPDATE 1"
+            
+            if result is None:
+                return False
+            
+            # Rescore an in-progress session only when its duration points change;
+            # other heartbeats leave the stored score to the end and sweep paths
+            rules = await scoring_rules.get(result["website_id"])
+            if rules.duration_score_changed(result["previous_duration"], session_duration):
+                scoring_worker.submit(session_id)
+            await live_scores.duration_reported(session_id, session_duration)
+            
+            return True
                 
         except Exception as e:
             print(f"❌ Error updating session duration: {e}")
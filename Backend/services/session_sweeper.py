@@ -0,0 +1,124 @@
+import os
+import asyncio
+import logging
+from typing import Optional, List
+from uuid import UUID
+from dotenv import load_dotenv
+from config.database import db_manager
+from services.lead_scoring_service import LeadScoringService
+from services.scoring_worker import scoring_worker
+from services.live_scores import live_scores
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Close one batch of idle open sessions: their open page views end at the
+# session's last activity, and the session ends there too. SKIP LOCKED lets
+# several app instances sweep at the same time without blocking each other.
+SWEEP_SQL = """
+    WITH stale AS (
+        SELECT session_id
+        FROM sessions
+        WHERE end_time IS NULL
+        AND last_activity < NOW() - make_interval(secs => $1)
+        ORDER BY last_activity
+        LIMIT $2
+        FOR UPDATE SKIP LOCKED
+    ),
+    closed_views AS (
+        UPDATE page_views pv
+        SET view_end = GREATEST(pv.view_start, s.last_activity)
+        FROM sessions s
+        JOIN stale ON stale.session_id = s.session_id
+        WHERE pv.session_id = s.session_id
+        AND pv.view_end IS NULL
+    )
+    UPDATE sessions s
+    SET end_time = s.last_activity,
+        session_duration = GREATEST(COALESCE(s.session_duration, INTERVAL '0'), s.last_activity - s.start_time)
+    FROM stale
+    WHERE s.session_id = stale.session_id
+    RETURNING s.session_id, EXTRACT(EPOCH FROM s.session_duration)::int as duration_seconds
+"""
+
+
+class StaleSessionSweeper:
+    """
+    Periodically closes and scores sessions whose end beacon never arrived.
+
+    A session with no activity for SESSION_IDLE_TIMEOUT seconds is closed with
+    set-based UPDATEs, in batches of SESSION_SWEEP_BATCH, and each batch is
+    scored in bulk with the site's scoring rules (falling back to the scoring
+    worker if the bulk write fails).
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("SESSION_SWEEP_ENABLED", "true").lower() == "true"
+        self.idle_timeout = float(os.getenv("SESSION_IDLE_TIMEOUT", "1800"))
+        self.interval = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+        self.batch_size = int(os.getenv("SESSION_SWEEP_BATCH", "500"))
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the periodic sweep"""
+        if not self.enabled:
+            print("ℹ️ Stale session sweeper disabled")
+            return
+        self.task = asyncio.create_task(self._run())
+        print(f"✅ Stale session sweeper started (idle timeout {int(self.idle_timeout)}s)")
+
+    async def stop(self):
+        """Stop the periodic sweep; a batch in progress is rolled back and retried next start"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        print("🔌 Stale session sweeper stopped")
+
+    async def sweep(self) -> int:
+        """Close and score all currently stale sessions. Returns the number closed."""
+        total = 0
+        while True:
+            closed = await self._sweep_batch()
+            total += len(closed)
+            if len(closed) < self.batch_size:
+                break
+
+        if total:
+            logger.info(f"✅ Swept {total} stale sessions")
+        return total
+
+    async def _sweep_batch(self) -> List[UUID]:
+        # Background maintenance runs on the ad-hoc pool, not the tracker's ingest pool
+        pool = await db_manager.get_connection("adhoc")
+        async with pool.acquire() as connection:
+            rows = await connection.fetch(SWEEP_SQL, self.idle_timeout, self.batch_size)
+
+        session_ids = [row["session_id"] for row in rows]
+        if not session_ids:
+            return session_ids
+
+        if await LeadScoringService.score_sessions(session_ids, workload="adhoc") is None:
+            # The sessions are closed now and will not be swept again, so fall back to the worker
+            logger.warning(f"Bulk scoring of {len(session_ids)} swept sessions failed, queueing them")
+            for session_id in session_ids:
+                scoring_worker.submit(session_id, ended=True)
+
+        for row in rows:
+            await live_scores.session_ended(row["session_id"], row["duration_seconds"])
+        return session_ids
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping stale sessions: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# Global stale session sweeper instance
+session_sweeper = StaleSessionSweeper()
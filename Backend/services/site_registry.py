@@ -0,0 +1,91 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict
+from dotenv import load_dotenv
+from config.database import db_manager
+from config.statements import statements
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WEBSITE_ID_SQL = statements.register("SELECT website_id FROM websites WHERE site_id = $1")
+
+
+class SiteRegistry:
+    """
+    In-memory map of site_id -> website_id shared by all services.
+
+    The map is warmed at startup and updated when a website is created, so the
+    ingest hot path no longer needs a websites lookup per event. Unknown site
+    ids are cached negatively for a short time so that a misconfigured tracker
+    cannot turn every event into a database round trip; that cache is bounded
+    so random site ids cannot grow it without limit.
+    """
+
+    def __init__(self):
+        self.negative_ttl = float(os.getenv("SITE_REGISTRY_NEGATIVE_TTL", "60"))
+        self.negative_max_size = int(os.getenv("SITE_REGISTRY_NEGATIVE_SIZE", "10000"))
+        self.website_ids: Dict[str, int] = {}
+        # site_id -> expiry; all entries share one TTL, so insertion order is expiry order
+        self.unknown_until: "OrderedDict[str, float]" = OrderedDict()
+
+    async def warm(self):
+        """Load every website into the registry"""
+        try:
+            pool = await db_manager.get_connection()
+            async with pool.acquire() as connection:
+                rows = await connection.fetch("SELECT site_id, website_id FROM websites")
+
+            self.website_ids = {row["site_id"]: row["website_id"] for row in rows}
+            self.unknown_until.clear()
+            print(f"✅ Site registry warmed with {len(self.website_ids)} websites")
+
+        except Exception as e:
+            logger.error(f"Error warming site registry: {e}")
+
+    async def get_website_id(self, site_id: str) -> Optional[int]:
+        """Resolve site_id to website_id, querying the database only on a cache miss"""
+        website_id = self.website_ids.get(site_id)
+        if website_id is not None:
+            return website_id
+
+        unknown_until = self.unknown_until.get(site_id)
+        if unknown_until is not None:
+            if unknown_until > time.monotonic():
+                return None
+            del self.unknown_until[site_id]
+
+        pool = await db_manager.get_connection()
+        async with pool.acquire() as connection:
+            website_id = await statements.fetchval(connection, WEBSITE_ID_SQL, site_id)
+
+        if website_id is None:
+            self._remember_unknown(site_id)
+            return None
+
+        self.register(site_id, website_id)
+        return website_id
+
+    def _remember_unknown(self, site_id: str):
+        """Cache a negative lookup, pruning expired entries and the oldest beyond the size limit"""
+        now = time.monotonic()
+        self.unknown_until.pop(site_id, None)
+        self.unknown_until[site_id] = now + self.negative_ttl
+        while self.unknown_until:
+            oldest_site_id, expires_at = next(iter(self.unknown_until.items()))
+            if expires_at > now and len(self.unknown_until) <= self.negative_max_size:
+                break
+            del self.unknown_until[oldest_site_id]
+
+    def register(self, site_id: str, website_id: int):
+        """Record a (new) website, dropping any negative entry for its site_id"""
+        self.website_ids[site_id] = website_id
+        self.unknown_until.pop(site_id, None)
+
+
+# Global site registry instance
+site_registry = SiteRegistry()
@@ -25,8 +25,8 @@ class SQLExecutor:
         try:
             logger.info(f"🔄 Executing SQL query...")
             
-            # Get database connection
-            pool = await db_manager.get_connection()
+            # Get database connection from the ad-hoc pool so slow queries cannot starve ingestion
+            pool = await db_manager.get_connection("adhoc")
             
             async with pool.acquire() as connection:
                 # Execute the query
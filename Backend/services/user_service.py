@@ -1,4 +1,6 @@
 from config.database import db_manager
+from services.site_registry import site_registry
+from services.identity_cache import identity_cache
 from typing import Optional, Dict, Any
 import asyncpg
 from datetime import datetime
@@ -9,18 +11,15 @@ class UserService:
     async def create_user(site_id: str, visitor_uuid: str, browser: str = None, os: str = None, user_agent: str = None) -> Optional[Dict[str, Any]]:
         """Create a new user record for first-time visitors"""
         try:
+            # First, get the website_id from site_id
+            website_id = await site_registry.get_website_id(site_id)
+            
+            if not website_id:
+                print(f"❌ Website not found for site_id: {site_id}")
+                return None
+            
             pool = await db_manager.get_connection()
             async with pool.acquire() as connection:
-                # First, get the website_id from site_id
-                website_query = "SELECT website_id FROM websites WHERE site_id = $1"
-                website_result = await connection.fetchrow(website_query, site_id)
-                
-                if not website_result:
-                    print(f"❌ Website not found for site_id: {site_id}")
-                    return None
-                
-                website_id = website_result['website_id']
-                
                 # Check if user already exists (shouldn't happen, but safety check)
                 existing_query = """
                     SELECT user_id FROM users 
@@ -30,6 +29,7 @@ class UserService:
                 
                 if existing_user:
                     print(f"⚠️ User already exists: {visitor_uuid}")
+                    identity_cache.remember(website_id, visitor_uuid, existing_user['user_id'])
                     return {"user_id": str(existing_user['user_id']), "is_new": False}
                 
                 # Insert new user
@@ -43,6 +43,7 @@ class UserService:
                 
                 if result:
                     print(f"✅ New user created: {visitor_uuid} for site: {site_id}")
+                    identity_cache.remember(website_id, visitor_uuid, result['user_id'])
                     return {
                         "user_id": str(result['user_id']),
                         "website_id": website_id,
@@ -76,16 +77,18 @@ class UserService:
                     WHERE users.website_id = websites.website_id 
                     AND websites.site_id = $1 
                     AND users.visitor_uuid = $2
-                    RETURNING users.user_id
+                    RETURNING users.user_id, users.website_id
                 """
                 
                 result = await connection.fetchrow(update_query, site_id, visitor_uuid)
                 
                 if result:
                     print(f"✅ Updated last_seen for user: {visitor_uuid}")
+                    identity_cache.remember(result['website_id'], visitor_uuid, result['user_id'])
                     return True
                 else:
                     print(f"⚠️ User not found for update: {visitor_uuid}")
+                    await UserService.forget_identity(site_id, visitor_uuid)
                     return False
                     
         except Exception as e:
@@ -151,8 +154,16 @@ class UserService:
                     return True
                 else:
                     print(f"⚠️ User not found for lead score update: {visitor_uuid}")
+                    await UserService.forget_identity(site_id, visitor_uuid)
                     return False
                     
         except Exception as e:
             print(f"❌ Error updating lead score: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    @staticmethod
+    async def forget_identity(site_id: str, visitor_uuid: str):
+        """Drop a visitor from the identity cache once its user row is gone"""
+        website_id = await site_registry.get_website_id(site_id)
+        if website_id:
+            identity_cache.invalidate(website_id, visitor_uuid)
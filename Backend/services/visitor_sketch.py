@@ -0,0 +1,54 @@
+import math
+import hashlib
+import numpy as np
+from typing import Iterable, Optional
+
+# HyperLogLog with 2^10 one-byte registers: 1 KB per sketch, ~3.3% standard error.
+# Sketches are stored as BYTEA in site_hourly_stats and merged by register-wise max,
+# so distinct visitors over any range of hours cost one merge per hour.
+INDEX_BITS = 10
+REGISTERS = 1 << INDEX_BITS
+RANK_BITS = 64 - INDEX_BITS
+
+
+def empty() -> np.ndarray:
+    return np.zeros(REGISTERS, dtype=np.uint8)
+
+
+def from_bytes(data: Optional[bytes]) -> np.ndarray:
+    if not data:
+        return empty()
+    return np.frombuffer(data, dtype=np.uint8).copy()
+
+
+def add(registers: np.ndarray, visitor_ids: Iterable) -> np.ndarray:
+    """Add visitors (UUIDs) to a sketch in place"""
+    for visitor_id in visitor_ids:
+        digest = hashlib.blake2b(visitor_id.bytes, digest_size=8).digest()
+        h = int.from_bytes(digest, "little")
+        index = h & (REGISTERS - 1)
+        rank = RANK_BITS - (h >> INDEX_BITS).bit_length() + 1
+        if rank > registers[index]:
+            registers[index] = rank
+    return registers
+
+
+def merge(sketches: Iterable[Optional[bytes]]) -> np.ndarray:
+    """Union of stored sketches"""
+    merged = empty()
+    for data in sketches:
+        if data:
+            np.maximum(merged, np.frombuffer(data, dtype=np.uint8), out=merged)
+    return merged
+
+
+def estimate(registers: np.ndarray) -> int:
+    """Estimated number of distinct visitors in a sketch"""
+    m = REGISTERS
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / float(np.sum(np.exp2(-registers.astype(np.float64))))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and zeros:
+        # Linear counting is more accurate for small cardinalities
+        return int(round(m * math.log(m / zeros)))
+    return int(round(raw))
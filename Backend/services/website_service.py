@@ -3,6 +3,7 @@ import uuid
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from config.database import db_manager
+from services.site_registry import site_registry
 
 class WebsiteService:
     @staticmethod
@@ -35,6 +36,8 @@ class WebsiteService:
                 )
                 
                 if result:
+                    # Make the new site visible to the ingest path right away
+                    site_registry.register(result["site_id"], result["website_id"])
                     return {
                         "website_id": result["website_id"],
                         "site_id": result["site_id"],
@@ -53,7 +56,7 @@ class WebsiteService:
     async def get_all_websites() -> List[Dict[str, Any]]:
         """Get all websites for dropdown selection"""
         try:
-            pool = await db_manager.get_connection()
+            pool = await db_manager.get_connection("dashboard")
             async with pool.acquire() as connection:
                 results = await connection.fetch(
                     """
@@ -0,0 +1,96 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from routers import analytics as analytics_router
+from services import analytics_service
+from services.analytics_service import (
+    AnalyticsService, EXPLORE_SESSIONS_SQL, EXPLORE_SESSIONS_AFTER_SQL,
+    encode_session_cursor, decode_session_cursor
+)
+
+
+def session_row(start_time):
+    return {
+        "session_id": uuid4(),
+        "user_id": None,
+        "start_time": start_time,
+        "end_time": None,
+        "duration_seconds": 30,
+        "browser": "Chrome",
+        "os": "Linux",
+        "lead_score": 10,
+        "page_view_count": 2,
+        "click_count": 1
+    }
+
+
+class FakeConnection:
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.calls = []
+
+    async def fetch(self, sql, *args):
+        self.calls.append((sql, args))
+        return self.pages.pop(0)
+
+
+class FakePool:
+    def __init__(self, connection):
+        self.connection = connection
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.connection
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    def install(pages):
+        connection = FakeConnection(pages)
+
+        async def get_website_id(site_id):
+            return 1
+
+        async def get_connection(workload="ingest"):
+            return FakePool(connection)
+
+        monkeypatch.setattr(analytics_service.site_registry, "get_website_id", get_website_id)
+        monkeypatch.setattr(analytics_service.db_manager, "get_connection", get_connection)
+        return connection
+    return install
+
+
+def test_cursor_encoding_round_trips():
+    start_time, session_id = datetime(2024, 5, 1, 12, 30, 15, 123456), uuid4()
+    assert decode_session_cursor(encode_session_cursor(start_time, session_id)) == (start_time, session_id)
+
+
+def test_next_cursor_selects_the_after_cursor_statement(fake_db):
+    first_page = [session_row(datetime(2024, 5, 1, 12, minute)) for minute in (30, 20)]
+    connection = fake_db([first_page, []])
+
+    page = asyncio.run(AnalyticsService.explore_sessions("site", limit=2))
+    assert [s["session_id"] for s in page["sessions"]] == [str(row["session_id"]) for row in first_page]
+    assert page["next_cursor"] is not None
+    assert connection.calls[0][0] == EXPLORE_SESSIONS_SQL
+
+    page = asyncio.run(AnalyticsService.explore_sessions("site", limit=2, cursor=page["next_cursor"]))
+    assert page == {"sessions": [], "next_cursor": None}
+    sql, args = connection.calls[1]
+    assert sql == EXPLORE_SESSIONS_AFTER_SQL
+    assert args[-2:] == (first_page[-1]["start_time"], first_page[-1]["session_id"])
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "2024-05-01T12:30:00_not-a-uuid", f"not-a-time_{uuid4()}"])
+def test_malformed_cursor_returns_400(fake_db, cursor):
+    connection = fake_db([])
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(analytics_router.explore_sessions("site", cursor=cursor, start=None, end=None))
+    assert error.value.status_code == 400
+    assert connection.calls == []
@@ -112,6 +112,16 @@
       });
     }
 
+    // Unique id of one tracked event; retried deliveries of the same payload
+    // carry the same id, so the server stores the event only once
+    function generateEventId() {
+      return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, function (c) {
+        const r = Math.random() * 16 | 0;
+        const v = c == 'x' ? r : (r & 0x3 | 0x8);
+        return v.toString(16);
+      });
+    }
+
     function initializeTracking() {
       // Generate or get persistent user ID (stored in localStorage for long-term tracking)
       const USER_ID_KEY = `analytics_user_${siteId}`;
@@ -260,7 +270,8 @@
               browser,
               os,
               userAgent,
-              action: "start"
+              action: "start",
+              eventId: generateEventId()
             };
 
             const sessionResponse = await fetch("https://web-analytics-agent.onrender.com/api/sessions", {
@@ -299,7 +310,8 @@
             userId,
             url,
             title,
-            referrer
+            referrer,
+            eventId: generateEventId()
           };
 
           const response = await fetch("https://web-analytics-agent.onrender.com/api/page-views", {
@@ -432,7 +444,8 @@
             elementSelector,
             elementText,
             xCoord: x,
-            yCoord: y
+            yCoord: y,
+            eventId: generateEventId()
           };
 
           const response = await fetch("https://web-analytics-agent.onrender.com/api/click-events", {
@@ -561,7 +574,8 @@
           sessionId: sessionStorage.getItem("sessionId"),
           userId,
           sessionDuration: finalDuration,
-          action: "end"
+          action: "end",
+          eventId: generateEventId()
         };
 
         console.log("🔄 Ending session:", endData);
@@ -605,7 +619,8 @@
           sessionId: sessionStorage.getItem("sessionId"),
           userId,
           sessionDuration: currentDuration,
-          action: "update"
+          action: "update",
+          eventId: generateEventId()
         };
 
         fetch("https://web-analytics-agent.onrender.com/api/sessions", {
@@ -33,88 +33,74 @@ const DashboardContent = ({ selectedSiteId }) => {
 
     useEffect(() => {
         if (selectedSiteId) {
-            fetchMetrics();
-            fetchTopPages();
-            fetchRecentSessions();
+            fetchDashboard();
         }
     }, [selectedSiteId]);
 
-    const fetchMetrics = async () => {
+    const buildMetrics = (metricsData) => [
+        {
+            title: 'Total Page Views',
+            value: metricsData.total_page_views.toLocaleString(),
+            change: '+0%', // TODO: Calculate change from previous period
+            trend: 'up',
+            icon: <Visibility />,
+            color: 'primary'
+        },
+        {
+            title: 'Unique Visitors',
+            value: metricsData.unique_visitors.toLocaleString(),
+            change: '+0%', // TODO: Calculate change from previous period
+            trend: 'up',
+            icon: <People />,
+            color: 'success'
+        },
+        {
+            title: 'Avg. Session Duration',
+            value: metricsData.avg_session_duration,
+            change: '+0%', // TODO: Calculate change from previous period
+            trend: 'up',
+            icon: <Schedule />,
+            color: 'info'
+        },
+        {
+            title: 'Pages per Session',
+            value: metricsData.pages_per_session.toString(),
+            change: '+0%', // TODO: Calculate change from previous period
+            trend: 'up',
+            icon: <Language />,
+            color: 'warning'
+        }
+    ];
+
+    // Metrics, top pages and recent sessions arrive in one response; a section
+    // that failed or timed out on the server is null and keeps its previous value
+    const fetchDashboard = async () => {
         setLoading(true);
         try {
-            const response = await fetch(`https://web-analytics-agent.onrender.com/api/analytics/${selectedSiteId}/metrics`);
+            const response = await fetch(`https://web-analytics-agent.onrender.com/api/analytics/${selectedSiteId}/dashboard`);
             const data = await response.json();
 
             if (data.status === 'success') {
-                const metricsData = [
-                    {
-                        title: 'Total Page Views',
-                        value: data.metrics.total_page_views.toLocaleString(),
-                        change: '+0%', // TODO: Calculate change from previous period
-                        trend: 'up',
-                        icon: <Visibility />,
-                        color: 'primary'
-                    },
-                    {
-                        title: 'Unique Visitors',
-                        value: data.metrics.unique_visitors.toLocaleString(),
-                        change: '+0%', // TODO: Calculate change from previous period
-                        trend: 'up',
-                        icon: <People />,
-                        color: 'success'
-                    },
-                    {
-                        title: 'Avg. Session Duration',
-                        value: data.metrics.avg_session_duration,
-                        change: '+0%', // TODO: Calculate change from previous period
-                        trend: 'up',
-                        icon: <Schedule />,
-                        color: 'info'
-                    },
-                    {
-                        title: 'Pages per Session',
-                        value: data.metrics.pages_per_session.toString(),
-                        change: '+0%', // TODO: Calculate change from previous period
-                        trend: 'up',
-                        icon: <Language />,
-                        color: 'warning'
-                    }
-                ];
-                setMetrics(metricsData);
+                if (data.metrics) {
+                    setMetrics(buildMetrics(data.metrics));
+                }
+                if (data.top_pages) {
+                    setTopPages(data.top_pages);
+                }
+                if (data.recent_sessions) {
+                    setRecentSessions(data.recent_sessions);
+                }
+                if (Object.keys(data.errors || {}).length > 0) {
+                    console.warn('Dashboard sections unavailable:', data.errors);
+                }
             }
         } catch (error) {
-            console.error('Error fetching metrics:', error);
+            console.error('Error fetching dashboard:', error);
         } finally {
             setLoading(false);
         }
     };
 
-    const fetchTopPages = async () => {
-        try {
-            const response = await fetch(`https://web-analytics-agent.onrender.com/api/analytics/${selectedSiteId}/top-pages`);
-            const data = await response.json();
-
-            if (data.status === 'success') {
-                setTopPages(data.top_pages);
-            }
-        } catch (error) {
-            console.error('Error fetching top pages:', error);
-        }
-    };
-
-    const fetchRecentSessions = async () => {
-        try {
-            const response = await fetch(`https://web-analytics-agent.onrender.com/api/analytics/${selectedSiteId}/recent-sessions`);
-            const data = await response.json();
-
-            if (data.status === 'success') {
-                setRecentSessions(data.recent_sessions);
-            }
-        } catch (error) {
-            console.error('Error fetching recent sessions:', error);
-        }
-    };
-
 
     return (
         <Box sx={{ display: 'flex', flexDirection: 'column', gap: 3 }}>